@@ -0,0 +1,47 @@
+"""
+Lazy values that are only worked out once.
+
+Django's ``lazy()`` calls its function again every time the proxy is used.
+:func:`lazy_once` evaluates it on first use and keeps the result until
+:func:`reset` is called, e.g. by tests that flip ``settings.DEV``.
+"""
+import functools
+
+from django.utils.functional import lazy
+
+
+# Functions called by reset(); see on_reset().
+_reset_hooks = []
+
+
+def on_reset(func):
+    """Registers ``func`` to be called by :func:`reset`."""
+    _reset_hooks.append(func)
+    return func
+
+
+def memoize(func):
+    """Caches the result of the argument-less ``func`` until :func:`reset`."""
+    cache = []
+
+    @on_reset
+    def forget():
+        del cache[:]
+
+    @functools.wraps(func)
+    def wrapper():
+        if not cache:
+            cache.append(func())
+        return cache[0]
+    return wrapper
+
+
+def lazy_once(func, *resultclasses):
+    """Like ``lazy(func, *resultclasses)()`` but ``func`` only runs once."""
+    return lazy(memoize(func), *resultclasses)()
+
+
+def reset():
+    """Forgets every memoized value so it is recomputed on next use."""
+    for hook in _reset_hooks:
+        hook()
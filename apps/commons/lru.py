@@ -0,0 +1,92 @@
+"""Small in-process LRU caches."""
+from collections import OrderedDict
+from datetime import date
+import threading
+
+
+_missing = object()
+
+
+class LRUCache(object):
+    """A bounded, thread-safe mapping that drops the least recently used key.
+
+    Hits, misses and evictions are counted so the cache can be sized; see
+    :meth:`stats`.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, _missing)
+            if value is _missing:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Returns the cache counters as a dict."""
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, size=len(self._data),
+                    maxsize=self.maxsize)
+
+
+class DailyLRUCache(LRUCache):
+    """An :class:`LRUCache` that empties itself when the day changes.
+
+    Use it for results that depend on ``date.today()``.  Django sets the
+    process time zone from ``settings.TIME_ZONE``, so the cache rolls over
+    at local midnight.  Entries dropped that way are counted as
+    ``expirations``.
+    """
+
+    def __init__(self, maxsize):
+        super(DailyLRUCache, self).__init__(maxsize)
+        self.day = date.today()
+        self.expirations = 0
+
+    def _roll_over(self):
+        today = date.today()
+        if today != self.day:
+            with self._lock:
+                if today != self.day:
+                    self.expirations += len(self._data)
+                    self._data.clear()
+                    self.day = today
+
+    def get(self, key, default=None):
+        self._roll_over()
+        return super(DailyLRUCache, self).get(key, default)
+
+    def set(self, key, value):
+        self._roll_over()
+        super(DailyLRUCache, self).set(key, value)
+
+    def stats(self):
+        stats = super(DailyLRUCache, self).stats()
+        stats['expirations'] = self.expirations
+        return stats
@@ -0,0 +1,65 @@
+import os
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loaders.app_directories import app_template_dirs
+
+import jingo
+import jinja2
+
+
+def template_names(dirs, extensions, exclude=()):
+    """
+    Yields the name of every template under ``dirs``, once each. Names
+    whose first directory is in ``exclude`` are left out.
+    """
+    seen = set()
+    for template_dir in dirs:
+        for root, _, files in os.walk(template_dir):
+            for filename in files:
+                if os.path.splitext(filename)[1] not in extensions:
+                    continue
+                full_path = os.path.join(root, filename)
+                name = os.path.relpath(full_path, template_dir)
+                name = name.replace(os.sep, '/')
+                if name.split('/')[0] in exclude:
+                    continue
+                if name not in seen:
+                    seen.add(name)
+                    yield name
+
+
+class Command(BaseCommand):
+    help = ('Compiles every Jinja template into the bytecode cache so '
+            'workers start warm. Run it when deploying.')
+    option_list = BaseCommand.option_list + (
+        make_option('--extensions', default='html,lhtml,txt',
+                    help='Comma separated template file extensions.'),
+    )
+
+    def handle(self, *args, **options):
+        if not jingo.env.bytecode_cache:
+            raise CommandError('No bytecode cache is configured; set '
+                               'JINJA_BYTECODE_CACHE_DIR.')
+        extensions = set('.' + e.strip().lstrip('.')
+                         for e in options['extensions'].split(','))
+        dirs = list(settings.TEMPLATE_DIRS) + list(app_template_dirs)
+        # Apps whose templates are Django templates, not Jinja ones.
+        exclude = getattr(settings, 'JINGO_EXCLUDE_APPS', ())
+        verbosity = int(options.get('verbosity', 1))
+        compiled = skipped = 0
+        for name in template_names(dirs, extensions, exclude):
+            try:
+                jingo.env.get_template(name)
+            except jinja2.TemplateError as e:
+                # Third-party apps ship Django templates that Jinja can't
+                # parse; they are never rendered through jingo anyway.
+                skipped += 1
+                self.stderr.write('Skipped %s: %s\n' % (name, e))
+                continue
+            compiled += 1
+            if verbosity > 1:
+                self.stdout.write('Compiled %s\n' % name)
+        self.stdout.write('Compiled %s templates, skipped %s.\n'
+                          % (compiled, skipped))
@@ -7,24 +7,119 @@ the locale codes.
 
 import urllib
 
+from django.conf import settings
+from django.core.urlresolvers import Resolver404, resolve
 from django.http import HttpResponsePermanentRedirect
+from django.utils import translation
 from django.utils.encoding import smart_str
+from django.utils.importlib import import_module
 
 import tower
 
-from . import urlresolvers
+from . import lazy, urlresolvers
 from .helpers import urlparams
+from .lru import LRUCache
+
+
+def is_lean(request, prefixer=None):
+    """
+    Is this request for a view marked ``lean`` (see ``pto.decorators.lean``)?
+
+    Lean views skip the middleware wrapped with :func:`skip_for_lean`. The
+    answer is worked out from the URL, locale prefix stripped, before the
+    view runs, and remembered for the request.  Resolving the URL is only
+    done the first time a path is seen; see :data:`lean_paths`.
+    """
+    if not hasattr(request, '_lean'):
+        request._lean = False
+        if settings.LEAN_VIEWS_ENABLED:
+            if prefixer is None:
+                prefixer = urlresolvers.Prefixer(request)
+            path = '/' + prefixer.shortened_path
+            request._lean = lean_paths.get(path)
+            if request._lean is None:
+                try:
+                    match = resolve(path)
+                except Resolver404:
+                    request._lean = False
+                else:
+                    request._lean = getattr(match.func, 'lean', False)
+                lean_paths.set(path, request._lean)
+    return request._lean
+
+
+# Whether each recently seen path is for a lean view.
+lean_paths = LRUCache(settings.LEAN_PATH_CACHE_SIZE)
+lazy.on_reset(lean_paths.clear)
+
+
+def skip_for_lean(path):
+    """
+    Returns a middleware class that runs the middleware at ``path`` for every
+    request except those for lean views.
+    """
+    module, _, name = path.rpartition('.')
+    methods = ('process_request', 'process_view', 'process_template_response',
+               'process_response', 'process_exception')
+
+    class SkipForLean(object):
+
+        def __init__(self):
+            middleware = getattr(import_module(module), name)()
+            # Django checks which hooks a middleware has, so only expose the
+            # ones the wrapped middleware implements.
+            for method in methods:
+                if hasattr(middleware, method):
+                    setattr(self, method,
+                            self._wrap(method, getattr(middleware, method)))
+
+        def _wrap(self, method, hook):
+            passthrough = method in ('process_response',
+                                     'process_template_response')
+
+            def wrapper(request, *args):
+                if is_lean(request):
+                    # Hand the response on untouched.
+                    return args[0] if passthrough else None
+                return hook(request, *args)
+            return wrapper
+
+    SkipForLean.__name__ = name
+    return SkipForLean
+
+
+# Middleware that lean views can do without.
+SessionMiddleware = skip_for_lean(
+    'django.contrib.sessions.middleware.SessionMiddleware')
+CsrfViewMiddleware = skip_for_lean('django.middleware.csrf.CsrfViewMiddleware')
+AuthenticationMiddleware = skip_for_lean(
+    'django.contrib.auth.middleware.AuthenticationMiddleware')
+MessageMiddleware = skip_for_lean(
+    'django.contrib.messages.middleware.MessageMiddleware')
+FrameOptionsHeader = skip_for_lean('commonware.middleware.FrameOptionsHeader')
+
 
 class LocaleURLMiddleware(object):
     """
     1. Search for the locale.
     2. Save it in the request.
     3. Strip them from the URL.
+
+    Lean views get the prefix stripped but are never redirected, and run
+    in the default locale rather than the request's.
     """
 
     def process_request(self, request):
         prefixer = urlresolvers.Prefixer(request)
         urlresolvers.set_url_prefix(prefixer)
+
+        if is_lean(request, prefixer):
+            request.path_info = '/' + prefixer.shortened_path
+            request.locale = prefixer.locale
+            # Don't leave the last request's locale active on this thread.
+            translation.deactivate()
+            return
+
         full_path = prefixer.fix(prefixer.shortened_path)
 
         if 'lang' in request.GET:
@@ -0,0 +1,63 @@
+"""
+Per-client rate limiting.
+
+:class:`TokenBucketLimiter` keeps a token bucket per key in this process.
+:class:`CacheRateLimiter` counts requests in the Django cache instead, so
+the limit holds across every worker sharing that cache.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+from .lru import LRUCache
+
+
+class TokenBucketLimiter(object):
+    """
+    Allows ``rate`` requests a second per key, with bursts of up to
+    ``burst``. Buckets live in an LRU of ``max_keys`` entries so memory
+    stays bounded however many clients there are.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = float(rate)
+        self.burst = burst
+        self.buckets = LRUCache(max_keys)
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """Takes a token for ``key``; returns False if there are none."""
+        now = time.time()
+        with self._lock:
+            tokens, last = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets.set(key, (tokens, now))
+        return allowed
+
+
+class CacheRateLimiter(object):
+    """
+    Allows ``burst`` requests per key in each window of ``burst / rate``
+    seconds, counted with the cache's atomic ``incr``. This averages out
+    to the same rate as :class:`TokenBucketLimiter`.
+    """
+
+    def __init__(self, rate, burst, prefix='ratelimit'):
+        self.burst = burst
+        self.window = max(1, int(round(burst / float(rate))))
+        self.prefix = prefix
+
+    def allow(self, key):
+        window = int(time.time()) // self.window
+        cache_key = '%s:%s:%s' % (self.prefix, key, window)
+        cache.add(cache_key, 0, self.window)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # Evicted between add() and incr(); let it through.
+            return True
+        return count <= self.burst
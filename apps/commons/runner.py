@@ -0,0 +1,32 @@
+from django.conf import settings
+
+from test_utils.runner import RadicalTestSuiteRunner
+
+from . import lazy
+
+
+_missing = object()
+
+
+class TestSuiteRunner(RadicalTestSuiteRunner):
+    """
+    Swaps ``settings.TEST_SETTINGS`` in for the test run, however the run
+    was started, and puts the old values back afterwards.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super(TestSuiteRunner, self).setup_test_environment(**kwargs)
+        self._saved_settings = {}
+        for name, value in settings.TEST_SETTINGS.items():
+            self._saved_settings[name] = getattr(settings, name, _missing)
+            setattr(settings, name, value)
+        lazy.reset()
+
+    def teardown_test_environment(self, **kwargs):
+        for name, value in self._saved_settings.items():
+            if value is _missing:
+                delattr(settings, name)
+            else:
+                setattr(settings, name, value)
+        lazy.reset()
+        super(TestSuiteRunner, self).teardown_test_environment(**kwargs)
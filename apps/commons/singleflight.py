@@ -0,0 +1,108 @@
+"""
+Request coalescing.
+
+When many callers ask for the same thing at once, only one should do the
+work.  :class:`SingleFlight` coalesces the threads of this process;
+:class:`CacheSingleFlight` coalesces every process sharing the Django
+cache, using an ``add()`` as the lock.  Wrap one in the other to do both.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = self.error = None
+
+
+class SingleFlight(object):
+    """
+    Runs one call per key at a time.  Callers that ask for a key while its
+    call is running wait for it and get its result (or its exception)
+    instead of calling again.  Nothing is kept once the call returns.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = self.shared = 0
+
+    def do(self, key, func):
+        """Returns ``func()``, or the result of the call already running
+        for ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+class CacheSingleFlight(object):
+    """
+    Runs one call per key at a time across processes.  The first caller
+    takes a lock in the cache and stores the result there for
+    ``result_timeout`` seconds; the others poll for it.  If the result
+    doesn't show up within ``timeout`` seconds, because the caller holding
+    the lock died, say, they give up waiting and call ``func`` themselves.
+
+    Results must be picklable.
+    """
+
+    def __init__(self, timeout=5, result_timeout=5, poll=0.01,
+                 prefix='singleflight'):
+        self.timeout = timeout
+        self.result_timeout = result_timeout
+        self.poll = poll
+        self.prefix = prefix
+
+    def _keys(self, key):
+        digest = hashlib.md5(repr(key)).hexdigest()
+        return ('%s:%s:lock' % (self.prefix, digest),
+                '%s:%s:result' % (self.prefix, digest))
+
+    def do(self, key, func):
+        """Returns ``func()``, or the result another process got for
+        ``key``."""
+        lock, result = self._keys(key)
+        # Some backends take a timeout of 0 to mean forever.
+        lock_timeout = max(1, int(math.ceil(self.timeout)))
+        deadline = time.time() + self.timeout
+        while True:
+            value = cache.get(result)
+            if value is not None:
+                return value[0]
+            if cache.add(lock, 1, lock_timeout):
+                break
+            if time.time() >= deadline:
+                return func()
+            time.sleep(self.poll)
+        try:
+            value = func()
+            cache.set(result, (value,), self.result_timeout)
+        finally:
+            cache.delete(lock)
+        return value
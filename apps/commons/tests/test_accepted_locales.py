@@ -4,6 +4,8 @@ import shutil
 from django.conf import settings
 import test_utils
 
+from commons import lazy
+from commons.urlresolvers import find_supported, language_tables
 import manage
 
 
@@ -53,6 +55,7 @@ class AcceptedLocalesTest(test_utils.TestCase):
         settings.DEV = cls.DEV
         settings.PROD_LANGUAGES = cls.PROD_LANGUAGES
         settings.DEV_LANGUAGES = cls.DEV_LANGUAGES
+        lazy.reset()
         shutil.rmtree(cls.locale)
         os.rename(cls.locale_bkp, cls.locale)
 
@@ -78,6 +81,7 @@ class AcceptedLocalesTest(test_utils.TestCase):
         # simulate the successful result of the DEV_LANGUAGES list 
         # comprehension defined in settings.
         settings.DEV_LANGUAGES = ['en-US', 'fr']
+        lazy.reset()
         assert settings.LANGUAGE_URL_MAP == {'en-us': 'en-US', 'fr': 'fr'}, \
                ('DEV is True, but DEV_LANGUAGES are not used to define the '
                 'allowed locales.')
@@ -89,6 +93,29 @@ class AcceptedLocalesTest(test_utils.TestCase):
 
         """
         settings.DEV = False
+        lazy.reset()
         assert settings.LANGUAGE_URL_MAP == {'en-us': 'en-US'}, \
                ('DEV is False, but PROD_LANGUAGES are not used to define the '
                 'allowed locales.')
+
+    def test_memoized_until_reset(self):
+        """Language settings are only recomputed after a reset."""
+        settings.DEV = False
+        lazy.reset()
+        assert settings.LANGUAGE_URL_MAP == {'en-us': 'en-US'}
+        settings.DEV = True
+        settings.DEV_LANGUAGES = ['en-US', 'fr']
+        assert settings.LANGUAGE_URL_MAP == {'en-us': 'en-US'}
+        lazy.reset()
+        assert settings.LANGUAGE_URL_MAP == {'en-us': 'en-US', 'fr': 'fr'}
+
+    def test_language_tables(self):
+        """The lookup tables used by the URL prefixer follow the settings."""
+        settings.DEV = True
+        settings.DEV_LANGUAGES = ['en-US', 'en-GB', 'fr']
+        lazy.reset()
+        url_map, supported, best = language_tables()
+        assert url_map == {'en-us': 'en-US', 'en-gb': 'en-GB', 'fr': 'fr'}
+        assert sorted(supported['en']) == ['en-GB', 'en-US']
+        assert best['fr'] == 'fr' and best['en'] in ('en-GB', 'en-US')
+        assert sorted(find_supported('en-CA')) == ['en-GB', 'en-US']
@@ -0,0 +1,51 @@
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+import jingo
+import jinja2
+from nose.tools import assert_raises, eq_
+import test_utils
+
+from commons.management.commands.compile_templates import (Command,
+                                                            template_names)
+
+
+class CompileTemplatesTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.old = jingo.env.bytecode_cache, jingo.env.cache
+        # Templates already loaded in this process would skip the cache.
+        jingo.env.bytecode_cache = jinja2.FileSystemBytecodeCache(self.dir)
+        jingo.env.cache = None
+
+    def tearDown(self):
+        jingo.env.bytecode_cache, jingo.env.cache = self.old
+        shutil.rmtree(self.dir)
+
+    def test_template_names(self):
+        for name in ('a/one.html', 'a/b/two.txt', 'skip/three.html',
+                     'four.css'):
+            path = os.path.join(self.dir, *name.split('/'))
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+        eq_(sorted(template_names([self.dir, self.dir], ('.html', '.txt'),
+                                  exclude=('skip',))),
+            ['a/b/two.txt', 'a/one.html'])
+
+    def test_writes_bytecode(self):
+        stdout = StringIO()
+        call_command('compile_templates', stdout=stdout, stderr=StringIO())
+        assert 'Compiled' in stdout.getvalue()
+        assert [f for f in os.listdir(self.dir) if f.endswith('.cache')]
+
+    def test_no_cache(self):
+        jingo.env.bytecode_cache = None
+        # call_command would exit instead of raising.
+        assert_raises(CommandError, Command().handle, extensions='html')
@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from nose.tools import eq_
+import test_utils
+
+from commons.lru import DailyLRUCache, LRUCache
+
+
+class LRUCacheTest(test_utils.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        eq_(cache.get('a'), 1)
+        cache.set('c', 3)
+        eq_(cache.get('b'), None)
+        eq_(cache.get('a'), 1)
+        eq_(cache.get('c'), 3)
+        eq_(cache.stats(), dict(hits=3, misses=1, evictions=1, size=2,
+                                maxsize=2))
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.clear()
+        eq_(len(cache), 0)
+        eq_(cache.get('a', 'default'), 'default')
+
+
+class DailyLRUCacheTest(test_utils.TestCase):
+
+    def test_drops_entries_when_the_day_changes(self):
+        cache = DailyLRUCache(10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        eq_(cache.get('a'), 1)
+        cache.day = date.today() - timedelta(days=1)
+        eq_(cache.get('a'), None)
+        eq_(cache.day, date.today())
+        eq_(cache.stats()['expirations'], 2)
@@ -0,0 +1,29 @@
+from nose.tools import eq_
+import test_utils
+
+from commons.ratelimit import CacheRateLimiter, TokenBucketLimiter
+
+
+class TokenBucketLimiterTest(test_utils.TestCase):
+
+    def test_burst_then_limited(self):
+        limiter = TokenBucketLimiter(rate=0.001, burst=3)
+        eq_([limiter.allow('1.2.3.4') for i in range(4)],
+            [True, True, True, False])
+        assert limiter.allow('5.6.7.8')
+
+    def test_refills(self):
+        limiter = TokenBucketLimiter(rate=1000, burst=1)
+        assert limiter.allow('1.2.3.4')
+        tokens, last = limiter.buckets.get('1.2.3.4')
+        limiter.buckets.set('1.2.3.4', (tokens, last - 1))
+        assert limiter.allow('1.2.3.4')
+
+
+class CacheRateLimiterTest(test_utils.TestCase):
+
+    def test_burst_then_limited(self):
+        limiter = CacheRateLimiter(rate=0.001, burst=2,
+                                   prefix='test-ratelimit')
+        eq_([limiter.allow('1.2.3.4') for i in range(3)],
+            [True, True, False])
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+from nose.tools import eq_
+import test_utils
+
+from commons.singleflight import CacheSingleFlight, SingleFlight
+
+
+class SingleFlightTest(test_utils.TestCase):
+
+    def test_shared(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait()
+            return 'body'
+
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(flight.do('key', slow)))
+            for i in range(5)]
+        for thread in threads:
+            thread.start()
+        # Wait for the other four to queue up behind the first.
+        while flight.shared < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        eq_((len(calls), results), (1, ['body'] * 5))
+        eq_((flight.calls, flight.shared), (1, 4))
+        # Nothing is kept afterwards.
+        eq_(flight.do('key', lambda: 'again'), 'again')
+
+    def test_error(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError('no good')
+
+        self.assertRaises(ValueError, flight.do, 'key', fail)
+        eq_(flight.do('key', lambda: 1), 1)
+
+
+class CacheSingleFlightTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.flight = CacheSingleFlight(timeout=0.05, prefix='test-flight')
+        self.lock, self.result = self.flight._keys('key')
+
+    def tearDown(self):
+        cache.delete_many([self.lock, self.result])
+
+    def test_result_shared(self):
+        eq_(self.flight.do('key', lambda: 'body'), 'body')
+        eq_(cache.get(self.lock), None)
+        # Another process asking now gets the stored result.
+        eq_(self.flight.do('key', lambda: 'other'), 'body')
+
+    def test_waits_for_lock(self):
+        cache.add(self.lock, 1)
+        # The holder stores its result while we wait.
+        timer = threading.Timer(0.01, cache.set,
+                                [self.result, ('theirs',), 5])
+        timer.start()
+        flight = CacheSingleFlight(timeout=5, prefix='test-flight')
+        eq_(flight.do('key', lambda: 'ours'), 'theirs')
+        timer.join()
+
+    def test_gives_up(self):
+        cache.add(self.lock, 1)
+        eq_(self.flight.do('key', lambda: 'ours'), 'ours')
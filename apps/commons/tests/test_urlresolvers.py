@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.test.client import RequestFactory
+
+from nose.tools import eq_
+import test_utils
+
+from commons import lazy
+from commons.urlresolvers import Prefixer, accept_language_cache
+
+
+class BestLanguageTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.DEV = settings.DEV
+        self.DEV_LANGUAGES = settings.DEV_LANGUAGES
+        settings.DEV = True
+        settings.DEV_LANGUAGES = ['en-US', 'fr']
+        lazy.reset()
+        self.prefixer = Prefixer(RequestFactory().get('/'))
+
+    def tearDown(self):
+        settings.DEV = self.DEV
+        settings.DEV_LANGUAGES = self.DEV_LANGUAGES
+        lazy.reset()
+
+    def test_negotiation(self):
+        eq_(self.prefixer.get_best_language('fr-CA,en;q=0.5'), 'fr')
+        eq_(self.prefixer.get_best_language('en-GB'), 'en-US')
+        eq_(self.prefixer.get_best_language('de'), False)
+
+    def test_cached_by_header(self):
+        header = 'fr;q=0.9,en;q=0.8'
+        eq_(self.prefixer.get_best_language(header), 'fr')
+        hits = accept_language_cache.hits
+        eq_(self.prefixer.get_best_language(header), 'fr')
+        eq_(accept_language_cache.hits, hits + 1)
+
+    def test_unmatched_headers_are_cached(self):
+        self.prefixer.get_best_language('de')
+        hits = accept_language_cache.hits
+        eq_(self.prefixer.get_best_language('de'), False)
+        eq_(accept_language_cache.hits, hits + 1)
+
+    def test_reset_clears_cache(self):
+        self.prefixer.get_best_language('fr')
+        lazy.reset()
+        eq_(len(accept_language_cache), 0)
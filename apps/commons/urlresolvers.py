@@ -4,6 +4,9 @@ from django.conf import settings
 from django.core.urlresolvers import reverse as django_reverse
 from django.utils.translation.trans_real import parse_accept_lang_header
 
+from . import lazy
+from .lru import LRUCache
+
 
 # Thread-local storage for URL prefixes. Access with (get|set)_url_prefix.
 _local = local()
@@ -32,10 +35,40 @@ def reverse(viewname, urlconf=None, args=None, kwargs=None, prefix=None):
         return url
 
 
+# Negotiated locales keyed by the raw Accept-Language header. Real traffic
+# only sends a handful of distinct headers; stats() shows how many.
+accept_language_cache = LRUCache(settings.ACCEPT_LANGUAGE_CACHE_SIZE)
+lazy.on_reset(accept_language_cache.clear)
+
+
+@lazy.memoize
+def language_tables():
+    """
+    Lookup tables derived from ``settings.LANGUAGE_URL_MAP``.
+
+    Returns ``(url_map, supported, best)``:
+
+    * ``url_map`` maps lowercase locales to their proper case.
+    * ``supported`` maps a language prefix (``fr`` in ``fr-CA``) to the
+      locales sharing it.
+    * ``best`` is ``url_map`` plus each prefix mapped to the first locale
+      having it, for Accept-Language matching.
+
+    Built once; reset with ``commons.lazy.reset()``.
+    """
+    url_map = dict(settings.LANGUAGE_URL_MAP)
+    supported = {}
+    best = dict(url_map)
+    for key, locale in url_map.items():
+        prefix = key.split('-', 1)[0]
+        supported.setdefault(prefix, []).append(locale)
+        if prefix not in best:
+            best[prefix] = locale
+    return url_map, supported, best
+
+
 def find_supported(test):
-    return [settings.LANGUAGE_URL_MAP[x] for
-            x in settings.LANGUAGE_URL_MAP if
-            x.split('-', 1)[0] == test.lower().split('-', 1)[0]]
+    return list(language_tables()[1].get(test.lower().split('-', 1)[0], []))
 
 
 class Prefixer(object):
@@ -57,8 +90,9 @@ class Prefixer(object):
         first, _, rest = path.partition('/')
 
         lang = first.lower()
-        if lang in settings.LANGUAGE_URL_MAP:
-            return settings.LANGUAGE_URL_MAP[lang], rest
+        url_map = language_tables()[0]
+        if lang in url_map:
+            return url_map[lang], rest
         else:
             supported = find_supported(first)
             if len(supported):
@@ -74,8 +108,9 @@ class Prefixer(object):
         """
         if 'lang' in self.request.GET:
             lang = self.request.GET['lang'].lower()
-            if lang in settings.LANGUAGE_URL_MAP:
-                return settings.LANGUAGE_URL_MAP[lang]
+            url_map = language_tables()[0]
+            if lang in url_map:
+                return url_map[lang]
 
         if self.request.META.get('HTTP_ACCEPT_LANGUAGE'):
             best = self.get_best_language(
@@ -86,11 +121,14 @@ class Prefixer(object):
 
     def get_best_language(self, accept_lang):
         """Given an Accept-Language header, return the best-matching language."""
-        LUM = settings.LANGUAGE_URL_MAP
-        PREFIXES = dict((x.split('-')[0], LUM[x]) for x in LUM)
-        langs = dict(LUM)
-        langs.update((k.split('-')[0], v) for k, v in LUM.items() if
-                      k.split('-')[0] not in langs)
+        best = accept_language_cache.get(accept_lang)
+        if best is None:
+            best = self._negotiate_language(accept_lang)
+            accept_language_cache.set(accept_lang, best)
+        return best
+
+    def _negotiate_language(self, accept_lang):
+        langs = language_tables()[2]
         ranked = parse_accept_lang_header(accept_lang)
         for lang, _ in ranked:
             lang = lang.lower()
@@ -0,0 +1,208 @@
+"""
+PTO accrual math.
+
+PTO accrues on the 1st and the 15th of every month.  Rather than walking a
+calendar day by day, accrual events are numbered so that any date maps to
+the count of events on or before it.  Counting the events between two dates
+is then a subtraction, no matter how far apart the dates are.
+
+:data:`accrual_calendar` is a precomputed index of these dates shared by
+the whole process.  The views go through :mod:`pto.policies`, which
+builds on it and on indexes like it for other schedules.
+
+Hours are fixed-point integers here, counting ``1/scale`` of an hour; see
+:func:`hours_scale`.  Request values are converted with :func:`to_fixed`
+on the way in and :func:`round_fixed` on the way out, and everything in
+between is integer math.
+
+Rounding policy: an amount goes out as ``round(amount / scale, 2)``
+computed on a float, which is what the API returned when it used
+Decimals.  The division is correctly rounded (so it equals ``float()`` of
+the exact Decimal) and Python 2's ``round()`` then rounds ties away from
+zero, e.g. 0.125 becomes 0.13 and 10 becomes 10.0.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal
+import threading
+
+from django.conf import settings
+
+
+ACCRUAL_DAYS = (1, 15)
+
+HOURS_PER_DAY = 8
+
+
+def accrual_index(day):
+    """Returns the number of accrual events on or before ``day``.
+
+    Events are counted from January 1st of year 0, so only differences
+    between two indexes are meaningful.
+    """
+    months = day.year * 12 + day.month - 1
+    return months * 2 + (2 if day.day >= 15 else 1)
+
+
+def accrual_date(index):
+    """Returns the date of the accrual event numbered ``index``.
+
+    This is the inverse of :func:`accrual_index`: the event numbered ``n``
+    is the one that makes ``accrual_index()`` reach ``n``.
+    """
+    months, half = divmod(index - 1, 2)
+    year, month = divmod(months, 12)
+    return date(year, month + 1, ACCRUAL_DAYS[half])
+
+
+def count_accruals(start, end):
+    """Returns how many accrual events fall between ``start`` and ``end``.
+
+    Both dates are inclusive.  Zero is returned if ``end`` is before
+    ``start``.
+    """
+    if end < start:
+        return 0
+    count = accrual_index(end) - accrual_index(start)
+    if start.day in ACCRUAL_DAYS:
+        count += 1
+    return count
+
+
+def accrual_dates(start, end):
+    """Yields every accrual date from ``start`` to ``end``, inclusive."""
+    index = accrual_index(start)
+    if start.day not in ACCRUAL_DAYS:
+        index += 1
+    last = accrual_index(end)
+    while index <= last:
+        yield accrual_date(index)
+        index += 1
+
+
+def hours_scale(*values):
+    """Returns a scale that holds every Decimal in ``values`` exactly.
+
+    That is ``settings.PTO_HOURS_SCALE`` (hundredths of an hour by
+    default), or a larger power of ten if a value has more decimal places.
+    """
+    scale = settings.PTO_HOURS_SCALE
+    for value in values:
+        exponent = value.as_tuple()[2]
+        if exponent < 0:
+            scale = max(scale, 10 ** -exponent)
+    return scale
+
+
+def to_fixed(value, scale):
+    """Converts the Decimal ``value`` to an integer of ``1/scale`` hours."""
+    amount = value * scale
+    if amount != amount.to_integral_value():
+        raise ValueError('%s does not fit a scale of %s' % (value, scale))
+    return int(amount)
+
+
+def round_fixed(amount, scale, divisor=1):
+    """Returns ``amount / scale / divisor`` rounded for the API.
+
+    See the rounding policy at the top of the module.  The result is a
+    Decimal of what ``round()`` gave, e.g. ``Decimal('10.0')``.
+    """
+    return Decimal(str(round(float(amount) / (scale * divisor), 2)))
+
+
+class AccrualCalendar(object):
+    """A sorted index of accrual dates, stored as date ordinals.
+
+    The index covers a window of whole years and is built the first time
+    it is queried.  Counting the accruals between two dates is two bisects.
+    If a query falls outside the window, the window is grown to cover it
+    (and ``years`` past today) and the index is rebuilt.
+
+    ``schedule(start, end)`` yields the accrual dates in a range; it is
+    :func:`accrual_dates` (the 1st and 15th) unless another is given.
+    """
+
+    def __init__(self, years=None, schedule=accrual_dates):
+        self.years = years
+        self.schedule = schedule
+        self._lock = threading.Lock()
+        # (first ordinal, last ordinal, array of accrual ordinals); swapped
+        # out in one go so readers never see a half-built index.
+        self._index = None
+
+    def _window(self, start, end):
+        """Returns the index array, growing it to cover start..end."""
+        index = self._index
+        if (index is None or start.toordinal() < index[0] or
+            end.toordinal() > index[1]):
+            with self._lock:
+                index = self._grow(start, end)
+        return index[2]
+
+    def _grow(self, start, end):
+        index = self._index
+        today = date.today()
+        years = self.years
+        if years is None:
+            years = settings.PTO_ACCRUAL_CALENDAR_YEARS
+        first = date(min(start.year, today.year - 1), 1, 1)
+        last = date(max(end.year, min(today.year + years, date.max.year)),
+                    12, 31)
+        if index is not None:
+            first = min(first, date.fromordinal(index[0]))
+            last = max(last, date.fromordinal(index[1]))
+            if (first.toordinal() == index[0] and
+                last.toordinal() == index[1]):
+                # Another thread already grew it.
+                return index
+        ordinals = array('i', [d.toordinal()
+                               for d in self.schedule(first, last)])
+        self._index = (first.toordinal(), last.toordinal(), ordinals)
+        return self._index
+
+    def reset(self):
+        """Drops the index; it will be rebuilt on the next query."""
+        self._index = None
+
+    def count(self, start, end):
+        """Returns how many accruals fall between ``start`` and ``end``.
+
+        Both dates are inclusive, like :func:`count_accruals`.
+        """
+        if end < start:
+            return 0
+        ordinals = self._window(start, end)
+        return (bisect_right(ordinals, end.toordinal()) -
+                bisect_left(ordinals, start.toordinal()))
+
+    def count_many(self, start, ends):
+        """Returns an array of accrual counts from ``start`` to each end."""
+        if not ends:
+            return array('i')
+        ordinals = self._window(start, max(max(ends), start))
+        base = bisect_left(ordinals, start.toordinal())
+        return array('i', [max(bisect_right(ordinals, end.toordinal()) - base,
+                               0) for end in ends])
+
+    def span(self, start, end):
+        """Returns ``(ordinals, i, j)``, the index and the positions in it
+        of the accruals from ``start`` to ``end``, inclusive."""
+        ordinals = self._window(start, max(start, end))
+        i = bisect_left(ordinals, start.toordinal())
+        return ordinals, i, max(bisect_right(ordinals, end.toordinal()), i)
+
+    def dates(self, start, end):
+        """Yields every accrual date from ``start`` to ``end``, inclusive."""
+        if end < start:
+            return
+        ordinals = self._window(start, end)
+        i = bisect_left(ordinals, start.toordinal())
+        stop = bisect_right(ordinals, end.toordinal())
+        while i < stop:
+            yield date.fromordinal(ordinals[i])
+            i += 1
+
+
+accrual_calendar = AccrualCalendar()
@@ -2,13 +2,24 @@ import re
 
 from django.conf import settings
 
+from commons import lazy
+
 
 uppercase = re.compile(r'[A-Z]')
 
 
+@lazy.memoize
+def settings_snapshot():
+    """All uppercase settings, collected once per process.
+
+    Lazy settings such as ``LANGUAGES`` go in as their proxies, so nothing
+    is evaluated until a template uses it.
+    """
+    return dict((k, getattr(settings, k)) for k in dir(settings)
+                if uppercase.match(k[0]))
+
+
 def global_settings(request):
-    context = {}
-    for k in dir(settings):
-        if uppercase.match(k[0]):
-            context[k] = getattr(settings, k)
-    return context
+    # The context keeps the dict it is given, and templates may change it,
+    # so each request gets its own copy of the snapshot.
+    return dict(settings_snapshot())
@@ -0,0 +1,58 @@
+"""
+Parsing the dates sent to the API.
+
+The datepicker always sends ``YYYY-MM-DD``, which is parsed by slicing.
+Anything else goes to dateutil's fuzzy parser, and those fallbacks are
+counted so we know how often it happens.
+"""
+from datetime import date
+import logging
+import threading
+
+from django.conf import settings
+
+from dateutil.parser import parse as parse_datetime
+
+from commons.lru import DailyLRUCache
+
+
+log = logging.getLogger('pto')
+
+
+class DateParser(object):
+    """Parses date strings, remembering recent results.
+
+    dateutil fills in missing parts from today's date, so the cache is
+    emptied when the day changes.
+    """
+
+    def __init__(self, cache_size):
+        self.cache = DailyLRUCache(cache_size)
+        self.fallbacks = 0
+        # Request threads share the parser; only the slow path takes this.
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        day = self.cache.get(value)
+        if day is None:
+            day = self.parse(value)
+            self.cache.set(value, day)
+        return day
+
+    def parse(self, value):
+        if (len(value) == 10 and value[4] == value[7] == '-' and
+            value[:4].isdigit() and value[5:7].isdigit() and
+            value[8:].isdigit()):
+            return date(int(value[:4]), int(value[5:7]), int(value[8:]))
+        with self._lock:
+            self.fallbacks += 1
+        log.debug('Falling back to dateutil for %r', value)
+        return parse_datetime(value).date()
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats['fallbacks'] = self.fallbacks
+        return stats
+
+
+parse_date = DateParser(settings.PTO_DATE_CACHE_SIZE)
@@ -1,24 +1,181 @@
+from datetime import date
+from decimal import Decimal
 import functools
 import json
 import logging
 
 from django import http
+from django.conf import settings
+from django.core.urlresolvers import get_callable
+
+from commons.lazy import memoize
+from commons.ratelimit import CacheRateLimiter, TokenBucketLimiter
+
+from .inputs import BadRequest
 
 
 log = logging.getLogger('pto')
 
 
-def json_view(f):
+def _default(obj):
+    # Decimals go out as strings so no precision is lost on the way.
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError('%r is not JSON serializable' % obj)
+
+
+def _encoder():
+    """Returns the fastest JSON encoder available.
+
+    simplejson's C speedups beat the stdlib json module on older Pythons.
+    It is told not to handle Decimals itself so they are written the same
+    way whichever encoder is used.
+    """
+    try:
+        import simplejson
+        return simplejson.JSONEncoder(default=_default, use_decimal=False,
+                                      separators=(',', ':'))
+    except (ImportError, TypeError):
+        return json.JSONEncoder(default=_default, separators=(',', ':'))
+
+
+# The serializer json_view uses unless it is given another one.
+dumps = _encoder().encode
+
+
+def lean(f):
+    """
+    Marks a stateless view as lean: the locale redirect and the session,
+    CSRF, auth, messages and frame options middleware are skipped for it.
+
+    Lean views must not use ``request.session`` or ``request.user`` and
+    should only answer GETs, since CSRF checks don't run.
+    """
+    f.lean = True
+    return f
+
+
+def json_error(message, status, serializer=None):
+    """Returns a JSON ``{"error": message}`` response."""
+    serializer = serializer or dumps
+    response = http.HttpResponse(serializer(dict(error=message)),
+                                 content_type='application/json')
+    response.status_code = status
+    return response
+
+
+def remote_addr(request):
+    """Rate limits each client address; the default ``PTO_RATE_LIMIT_KEY``.
+
+    Behind a proxy every request comes from the proxy's address, so all
+    clients would share one limit; use :func:`forwarded_for` there.
+    """
+    return request.META.get('REMOTE_ADDR')
+
+
+def forwarded_for(request):
+    """Rate limits the address our proxy saw each request come from.
+
+    That is the last address in ``X-Forwarded-For``, the one the proxy
+    added; the ones before it come from the client and can't be trusted.
+    """
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    return forwarded.split(',')[-1].strip() or remote_addr(request)
+
+
+@memoize
+def rate_limit_key():
+    """Returns the ``PTO_RATE_LIMIT_KEY`` function."""
+    return get_callable(settings.PTO_RATE_LIMIT_KEY)
+
+
+@memoize
+def rate_limiter():
+    """Returns the limiter configured by ``PTO_RATE_LIMIT``, if any."""
+    if not settings.PTO_RATE_LIMIT:
+        return None
+    if settings.PTO_RATE_LIMIT_BACKEND == 'cache':
+        limiter = CacheRateLimiter
+    else:
+        limiter = TokenBucketLimiter
+    return limiter(settings.PTO_RATE_LIMIT, settings.PTO_RATE_BURST)
+
+
+def rate_limited(f):
+    """Answers 429 once the client has used up its requests.
+
+    Clients are told apart by ``settings.PTO_RATE_LIMIT_KEY``.
+    """
+    @functools.wraps(f)
+    def wrapper(request, *args, **kw):
+        limiter = rate_limiter()
+        if limiter and not limiter.allow(rate_limit_key()(request)):
+            response = json_error('Too many requests', 429)
+            response['Retry-After'] = '1'
+            return response
+        return f(request, *args, **kw)
+    return wrapper
+
+
+def json_view(f=None, serializer=None):
+    """
+    Serializes what the view returns as JSON.
+
+    :class:`~pto.inputs.BadRequest` becomes a 400 with the error message.
+
+    Decimals and dates are handled.  If the view returns an iterator (a
+    generator, say), it is streamed out as a JSON array with
+    :func:`json_stream`.  HttpResponses are passed through as they are.
+    Use ``@json_view(serializer=my_dumps)`` to serialize differently.
+    """
+    if f is None:
+        return functools.partial(json_view, serializer=serializer)
+    serializer = serializer or dumps
+
     @functools.wraps(f)
     def wrapper(*args, **kw):
         try:
             response = f(*args, **kw)
+        except BadRequest as e:
+            return json_error(str(e), 400, serializer)
         except:
             log.exception('JSON EXCEPTION')
             raise
         if isinstance(response, http.HttpResponse):
             return response
+        elif hasattr(response, 'next'):
+            return json_stream(response, serializer)
         else:
-            return http.HttpResponse(json.dumps(response),
+            return http.HttpResponse(serializer(response),
                                      content_type='application/json')
     return wrapper
+
+
+def json_stream(items, serializer=None, chunk_size=100):
+    """Returns a response that writes ``items`` out as a JSON array.
+
+    Items are serialized ``chunk_size`` at a time as the response is
+    iterated, so the whole array never has to be built in memory.
+    """
+    serializer = serializer or dumps
+
+    def chunks():
+        yield '['
+        chunk = []
+        separator = ''
+        try:
+            for item in items:
+                chunk.append(serializer(item))
+                if len(chunk) == chunk_size:
+                    yield separator + ','.join(chunk)
+                    separator = ','
+                    chunk = []
+        except:
+            log.exception('JSON STREAM EXCEPTION')
+            raise
+        if chunk:
+            yield separator + ','.join(chunk)
+        yield ']'
+    return http.HttpResponse(chunks(), content_type='application/json')
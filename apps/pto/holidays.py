@@ -0,0 +1,147 @@
+"""
+Company holidays and workday counting.
+
+Holidays are read from the iCalendar (``.ics``) and CSV files listed in
+``settings.PTO_HOLIDAY_FILES`` the first time they are needed and kept in
+a sorted array of date ordinals.  Counting the workdays in a date range is
+then arithmetic for the weekends plus two bisects for the holidays.
+
+CSV files have a date (``YYYY-MM-DD``) in the first column; other columns,
+blank lines and ``#`` comments are ignored, and so is the first row if it
+isn't a date, as a header.  In iCalendar files every ``VEVENT``'s
+``DTSTART`` up to (not including) its ``DTEND`` is a holiday.  Recurrence
+rules are not supported, so list each year's holidays.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import csv
+from datetime import date, timedelta
+from decimal import Decimal
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from commons.lazy import memoize
+
+from .accrual import HOURS_PER_DAY
+
+
+def read_csv(f):
+    """Yields the dates in a CSV file of holidays."""
+    reader = csv.reader(f)
+    first = True
+    for row in reader:
+        value = row[0].strip() if row else ''
+        if not value or value.startswith('#'):
+            continue
+        try:
+            day = parse_iso_day(value)
+        except ValueError as e:
+            if not first:
+                raise ImproperlyConfigured(
+                    '%s, line %s: %s' % (getattr(f, 'name', 'holidays'),
+                                         reader.line_num, e))
+            # The header row.
+        else:
+            yield day
+        first = False
+
+
+def parse_day(value):
+    """Parses ``YYYYMMDD``, ignoring any time after it."""
+    value = value.strip()
+    if len(value) < 8 or not value[:8].isdigit():
+        raise ValueError('Not a date: %r' % value)
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+
+def parse_iso_day(value):
+    """Parses ``YYYY-MM-DD``."""
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError('Not a YYYY-MM-DD date: %r' % value)
+    return parse_day(value[:4] + value[5:7] + value[8:])
+
+
+def read_ical(f):
+    """Yields the dates covered by the events in an iCalendar file."""
+    start = end = None
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        name, _, value = line.partition(':')
+        name = name.split(';')[0].upper()
+        try:
+            if line.upper() == 'BEGIN:VEVENT':
+                start = end = None
+            elif name == 'DTSTART':
+                start = parse_day(value)
+            elif name == 'DTEND':
+                end = parse_day(value)
+        except ValueError as e:
+            raise ImproperlyConfigured('%s, line %s: %s'
+                                       % (getattr(f, 'name', 'holidays'),
+                                          number, e))
+        if line.upper() == 'END:VEVENT' and start:
+            day = start
+            yield day
+            while end and day + timedelta(days=1) < end:
+                day += timedelta(days=1)
+                yield day
+
+
+def weekdays(start, end):
+    """Returns how many Mondays to Fridays fall from ``start`` to ``end``."""
+    if end < start:
+        return 0
+    weeks, extra = divmod((end - start).days + 1, 7)
+    count = weeks * 5
+    first = start.weekday()
+    for i in range(extra):
+        if (first + i) % 7 < 5:
+            count += 1
+    return count
+
+
+class HolidayCalendar(object):
+    """An index of the holidays in ``paths`` that fall on weekdays."""
+
+    def __init__(self, paths):
+        days = set()
+        for path in paths:
+            if path.lower().endswith('.ics'):
+                reader = read_ical
+            elif path.lower().endswith('.csv'):
+                reader = read_csv
+            else:
+                raise ImproperlyConfigured(
+                    'Holiday files must be .ics or .csv: %s' % path)
+            if not os.path.exists(path):
+                raise ImproperlyConfigured('No holiday file at %s' % path)
+            with open(path) as f:
+                days.update(d for d in reader(f) if d.weekday() < 5)
+        self.ordinals = array('i', sorted(d.toordinal() for d in days))
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def holidays(self, start, end):
+        """Returns how many weekday holidays fall from ``start`` to ``end``."""
+        if end < start:
+            return 0
+        return (bisect_right(self.ordinals, end.toordinal()) -
+                bisect_left(self.ordinals, start.toordinal()))
+
+    def workdays(self, start, end):
+        """Returns how many workdays fall from ``start`` to ``end``."""
+        return weekdays(start, end) - self.holidays(start, end)
+
+    def workday_hours(self, start, end):
+        """Returns the hours (a Decimal) a trip from ``start`` to ``end``
+        costs."""
+        return Decimal(self.workdays(start, end) * HOURS_PER_DAY)
+
+
+@memoize
+def holiday_calendar():
+    """The :class:`HolidayCalendar` for ``settings.PTO_HOLIDAY_FILES``."""
+    return HolidayCalendar(settings.PTO_HOLIDAY_FILES)
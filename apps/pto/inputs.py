@@ -0,0 +1,133 @@
+"""
+Reading and bounding the API's query parameters.
+
+Anything the API won't accept raises :class:`BadRequest`, which
+``json_view`` turns into a cheap 400 instead of logging a traceback and
+returning a 500.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+import json
+
+from django.conf import settings
+from django.utils.encoding import smart_str
+
+from .dates import parse_date
+from .policies import get_policy
+
+
+class BadRequest(Exception):
+    """The request's parameters are missing, malformed or out of bounds."""
+
+
+def _values(request, name, many):
+    values = request.GET.getlist(name)
+    if not values:
+        raise BadRequest('%s is required' % name)
+    if not many and len(values) > 1:
+        raise BadRequest('%s may only be given once' % name)
+    if len(values) > settings.PTO_MAX_ITEMS:
+        raise BadRequest('%s may be given at most %s times'
+                         % (name, settings.PTO_MAX_ITEMS))
+    return values
+
+
+def quoted(value):
+    """Returns ``value`` quoted for an error message, as a UTF-8 string."""
+    return "'%s'" % smart_str(value)
+
+
+def to_date(value, name):
+    """Parses ``value``, which must be within the allowed horizon."""
+    try:
+        day = parse_date(value)
+    except (ValueError, OverflowError, TypeError, AttributeError):
+        raise BadRequest('%s is not a date: %s' % (name, quoted(value)))
+    today = date.today()
+    if abs(day.year - today.year) > settings.PTO_MAX_HORIZON_YEARS:
+        raise BadRequest('%s must be within %s years of today'
+                         % (name, settings.PTO_MAX_HORIZON_YEARS))
+    return day
+
+
+def to_hours(value, name):
+    """Parses ``value`` as a finite, bounded number of hours."""
+    try:
+        hours = Decimal(value)
+    except (InvalidOperation, TypeError):
+        raise BadRequest('%s is not a number: %s' % (name, quoted(value)))
+    if not hours.is_finite() or abs(hours) > settings.PTO_MAX_HOURS:
+        raise BadRequest('%s must be between -%s and %s'
+                         % (name, settings.PTO_MAX_HOURS,
+                            settings.PTO_MAX_HOURS))
+    if hours.as_tuple()[2] < -settings.PTO_MAX_DECIMAL_PLACES:
+        raise BadRequest('%s may have at most %s decimal places'
+                         % (name, settings.PTO_MAX_DECIMAL_PLACES))
+    return hours
+
+
+def get_date(request, name):
+    return to_date(_values(request, name, False)[0], name)
+
+
+def get_dates(request, name):
+    return [to_date(v, name) for v in _values(request, name, True)]
+
+
+def get_hours(request, name):
+    return to_hours(_values(request, name, False)[0], name)
+
+
+def get_hours_list(request, name):
+    return [to_hours(v, name) for v in _values(request, name, True)]
+
+
+def get_list(request, name):
+    """Returns every value of ``name``, which may be left out."""
+    if name not in request.GET:
+        return []
+    return _values(request, name, True)
+
+
+def get_json_body(request):
+    """Returns the POSTed JSON object, with non-integers as Decimals."""
+    if request.method != 'POST':
+        raise BadRequest('POST a JSON object')
+    try:
+        body = json.loads(request.raw_post_data, parse_float=Decimal)
+    except ValueError:
+        raise BadRequest('The body is not valid JSON')
+    if not isinstance(body, dict):
+        raise BadRequest('POST a JSON object')
+    return body
+
+
+def get_field(obj, name, limit=None):
+    """Returns ``obj[name]``; lists may have at most ``limit`` items."""
+    if not isinstance(obj, dict) or name not in obj:
+        raise BadRequest('%s is required' % name)
+    value = obj[name]
+    if limit is not None:
+        if not isinstance(value, list):
+            raise BadRequest('%s must be a list' % name)
+        if len(value) > limit:
+            raise BadRequest('%s may have at most %s items' % (name, limit))
+    return value
+
+
+def read_policy(values):
+    """Returns ``(policy, hire_date)`` from a query string or JSON object.
+
+    ``policy`` names one of ``settings.PTO_ACCRUAL_POLICIES`` and defaults
+    to ``PTO_DEFAULT_POLICY``.  ``hire_date`` is optional and only matters
+    for policies with tenure tiers.
+    """
+    name = values.get('policy')
+    try:
+        policy = get_policy(name)
+    except (KeyError, TypeError):
+        raise BadRequest('No accrual policy called %s' % quoted(name))
+    hire_date = values.get('hire_date')
+    if hire_date is not None:
+        hire_date = to_date(hire_date, 'hire_date')
+    return policy, hire_date
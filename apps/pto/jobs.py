@@ -0,0 +1,106 @@
+"""
+Background jobs and their results, kept in the Django cache.
+
+A job's status is a dict under one key; its result rows are stored in
+chunks under keys of their own, so no single cache value gets big and the
+result can be streamed back a chunk at a time.  Everything expires after
+``settings.PTO_JOB_TTL`` seconds.  The tasks that fill them in are in
+:mod:`pto.tasks`.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import batches
+
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+def _key(job_id, part='status'):
+    return 'pto:job:%s:%s' % (job_id, part)
+
+
+def create(kind, params=None, staff_only=False):
+    """Returns ``(job id, created)`` for a new job.
+
+    If ``params`` is given and a job of this kind was started with the
+    same ones and hasn't failed or expired, that job's id is returned
+    instead, with ``created`` False.
+    """
+    dedupe = None
+    if params is not None:
+        digest = hashlib.md5(repr((kind, params))).hexdigest()
+        dedupe = 'pto:job-for:%s' % digest
+        job_id = cache.get(dedupe)
+        status = job_id and get_status(job_id)
+        if status and status['status'] in (PENDING, RUNNING, DONE):
+            return job_id, False
+    job_id = uuid.uuid4().hex
+    cache.set(_key(job_id), dict(kind=kind, status=PENDING, progress=0,
+                                 chunks=0, staff_only=staff_only),
+              settings.PTO_JOB_TTL)
+    if dedupe:
+        cache.set(dedupe, job_id, settings.PTO_JOB_TTL)
+    return job_id, True
+
+
+def start(job_id, task, *args):
+    """Queues ``task`` to fill in the job, with the job's id and ``args``.
+
+    If it can't be queued, the job is marked failed and the error raised.
+    """
+    try:
+        task.delay(job_id, *args)
+    except Exception as e:
+        set_status(job_id, status=FAILED, error=str(e))
+        raise
+
+
+def get_status(job_id):
+    """Returns the job's status dict, or None if it is unknown."""
+    return cache.get(_key(job_id))
+
+
+def set_status(job_id, **fields):
+    status = get_status(job_id) or {}
+    status.update(fields)
+    cache.set(_key(job_id), status, settings.PTO_JOB_TTL)
+
+
+def store(job_id, rows, total):
+    """Saves ``rows`` as the job's result, ``PTO_JOB_CHUNK_SIZE`` at a time.
+
+    ``total`` is how many rows are expected, for the progress.  The status
+    is updated after each chunk, and is ``failed`` with the error if
+    building the rows raises.
+    """
+    set_status(job_id, status=RUNNING)
+    done = chunks = 0
+    try:
+        for chunk in batches(rows, settings.PTO_JOB_CHUNK_SIZE):
+            cache.set(_key(job_id, chunks), chunk, settings.PTO_JOB_TTL)
+            chunks += 1
+            done += len(chunk)
+            set_status(job_id, chunks=chunks,
+                       progress=min(done / float(total or 1), 1.0))
+    except Exception as e:
+        set_status(job_id, status=FAILED, error=str(e))
+        raise
+    set_status(job_id, status=DONE, progress=1.0)
+
+
+def has_result(job_id, status):
+    """Whether a finished job's result is still all in the cache."""
+    # The first chunk was stored first, so it expires first.
+    return (status['status'] == DONE and
+            (not status['chunks'] or cache.get(_key(job_id, 0)) is not None))
+
+
+def result(job_id, status):
+    """Yields the rows of a finished job's result."""
+    for n in range(status['chunks']):
+        for row in cache.get(_key(job_id, n)) or []:
+            yield row
@@ -0,0 +1,130 @@
+"""
+PTO liability: the hours stored profiles have accrued but not used, by
+team and month.
+
+Reports read :class:`~pto.models.LiabilityRollup` rows, one per team and
+month, holding the sum of the team's balances at the end of the month.
+When a profile's snapshots change (see :mod:`pto.snapshots`) its team is
+marked stale from that month on, and :func:`refresh` recomputes only the
+stale months of the stale teams, with one aggregate query per month over
+the snapshot index.  That runs in :func:`pto.tasks.refresh_liability`
+and ``rebuild_snapshots``, never in a request: a report is a read of a
+few hundred rows, and says which teams are still stale.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import signals
+
+from .models import (BalanceSnapshot, LiabilityRollup, Profile,
+                     StaleLiability, batches)
+from .snapshots import snapshot_end, snapshots_changed
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def months(start, end):
+    """Yields the first of each month from ``start``'s to ``end``'s."""
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def last_month():
+    """The last month rollups are kept for: that of the last snapshot."""
+    return month_start(snapshot_end())
+
+
+def mark_stale(profiles, since=None):
+    """Marks the teams of ``profiles`` stale from the month ``since`` is
+    in, or from each profile's ``as_of`` date."""
+    stale = {}
+    for profile in profiles:
+        day = since or profile.as_of
+        if profile.team not in stale or day < stale[profile.team]:
+            stale[profile.team] = day
+    for team, day in stale.items():
+        StaleLiability.objects.mark(team, month_start(day))
+
+
+def refresh():
+    """Recomputes the stale rollups.  Returns how many teams were."""
+    with transaction.commit_on_success():
+        stale = [(team, since) for team, since
+                 in StaleLiability.objects.values_list('team', 'since')
+                 if StaleLiability.objects.claim(team, since)]
+        if not stale:
+            return 0
+        for month in months(min(since for _, since in stale), last_month()):
+            end = next_month(month) - timedelta(days=1)
+            teams = [team for team, since in stale if since <= month]
+            for batch in batches(teams):
+                totals = BalanceSnapshot.objects.team_totals(end, batch)
+                LiabilityRollup.objects.filter(month=month,
+                                               team__in=batch).delete()
+                LiabilityRollup.objects.bulk_insert(
+                    LiabilityRollup(month=month, team=team, hours=hours)
+                    for team, hours in totals.items())
+    return len(stale)
+
+
+def report(start, end, teams=None):
+    """Returns ``{team: {month: hours}}`` for the months from ``start``'s
+    to ``end``'s, read from the rollups as they are.
+
+    Teams with no balances in a month have no entry for it.  See
+    :func:`stale_teams` for which months may be out of date.
+    """
+    rollups = LiabilityRollup.objects.filter(month__gte=month_start(start),
+                                             month__lte=end)
+    if teams is not None:
+        rollups = rollups.filter(team__in=teams)
+    totals = {}
+    for team, month, hours in rollups.values_list('team', 'month', 'hours'):
+        totals.setdefault(team, {})[month] = hours
+    return totals
+
+
+def stale_teams(end, teams=None):
+    """Returns ``{team: month}`` for the teams whose rollups are stale from
+    ``month`` on, up to ``end``'s month."""
+    stale = StaleLiability.objects.filter(since__lte=end)
+    if teams is not None:
+        stale = stale.filter(team__in=teams)
+    return dict(stale.values_list('team', 'since'))
+
+
+def _snapshots_changed(sender, profiles, since=None, **kwargs):
+    mark_stale(profiles, since)
+
+
+def _remember_team(sender, instance, **kwargs):
+    # A profile moved to another team, or to a later as_of date, leaves
+    # the months it used to count in stale.
+    instance._saved_team = (instance.team, instance.as_of)
+
+
+def _profile_saved(sender, instance, **kwargs):
+    team, as_of = getattr(instance, '_saved_team', (None, None))
+    if as_of is not None:
+        StaleLiability.objects.mark(team, month_start(as_of))
+    _remember_team(sender, instance)
+
+
+def _profile_deleted(sender, instance, **kwargs):
+    mark_stale([instance])
+
+
+snapshots_changed.connect(_snapshots_changed, sender=BalanceSnapshot)
+signals.post_init.connect(_remember_team, sender=Profile)
+signals.post_save.connect(_profile_saved, sender=Profile)
+signals.post_delete.connect(_profile_deleted, sender=Profile)
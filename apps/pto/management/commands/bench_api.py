@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+from optparse import make_option
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.test.client import Client
+
+from commons import lazy
+
+
+class Command(BaseCommand):
+    help = ('Times calculate_pto.json through the full middleware stack, '
+            'with and without the lean view shortcut.')
+    option_list = BaseCommand.option_list + (
+        make_option('--requests', type='int', default=2000,
+                    help='Requests per run.'),
+    )
+
+    def handle(self, *args, **options):
+        url = '/%s%s' % (settings.LANGUAGE_CODE,
+                         reverse('pto.calculate_pto'))
+        query = dict(start_date=(date.today() +
+                                 timedelta(days=90)).isoformat(),
+                     per_quarter='5.19', hours_avail='0')
+        count = options['requests']
+        enabled = settings.LEAN_VIEWS_ENABLED
+        # Every request comes from one address, so don't time 429s.
+        rate_limit = settings.PTO_RATE_LIMIT
+        settings.PTO_RATE_LIMIT = None
+        lazy.reset()
+        try:
+            for lean in (False, True):
+                settings.LEAN_VIEWS_ENABLED = lean
+                client = Client()
+                # Warm up caches and lazy imports.
+                self.check(client.get(url, query))
+                start = time.time()
+                for i in xrange(count):
+                    self.check(client.get(url, query))
+                elapsed = time.time() - start
+                self.stdout.write('%-8s %8.1f us/request\n'
+                                  % ('lean' if lean else 'full',
+                                     elapsed / count * 1e6))
+        finally:
+            settings.LEAN_VIEWS_ENABLED = enabled
+            settings.PTO_RATE_LIMIT = rate_limit
+            lazy.reset()
+
+    def check(self, response):
+        if response.status_code != 200:
+            raise CommandError('calculate_pto.json answered %s: %s'
+                               % (response.status_code, response.content))
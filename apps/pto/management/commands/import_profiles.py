@@ -0,0 +1,204 @@
+import csv
+from datetime import date
+from decimal import Decimal
+import json
+import mmap
+from optparse import make_option
+import os
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from pto.inputs import BadRequest, quoted, read_policy, to_date, to_hours
+from pto.liability import month_start
+from pto.models import BATCH_SIZE, Profile, StaleLiability, batches
+from pto.snapshots import rebuild
+
+
+def csv_rows(lines):
+    """Yields ``(line number, row dict)`` from CSV lines with a header.
+    The values are left as bytes for :func:`read_row` to decode."""
+    reader = csv.reader(lines)
+    header = [name.strip().lower() for name in next(reader, [])]
+    for line, row in enumerate(reader, 2):
+        if row:
+            yield line, dict(zip(header, [v.strip() for v in row]))
+
+
+def jsonl_rows(lines):
+    """Yields ``(line number, object)`` from JSON lines; lines that aren't
+    JSON give None."""
+    for line, text in enumerate(lines, 1):
+        if text.strip():
+            try:
+                yield line, json.loads(text, parse_float=Decimal)
+            except ValueError:
+                yield line, None
+
+
+def read_row(row, as_of):
+    """Returns ``(username, {field: value})`` for the profile a row
+    describes.  ``as_of`` is the date to use if the row has none."""
+    if not isinstance(row, dict):
+        raise BadRequest('Expected a JSON object')
+    try:
+        # CSV values are still bytes; JSON ones are decoded already.
+        row = dict((name, value.decode('utf-8') if isinstance(value, str)
+                    else value) for name, value in row.items())
+    except UnicodeDecodeError:
+        raise BadRequest('Not UTF-8')
+    username = row.get('username')
+    if not username or not isinstance(username, basestring):
+        raise BadRequest('username is required')
+    policy_fields = dict((name, row.get(name) or None)
+                         for name in ('policy', 'hire_date'))
+    policy, hire_date = read_policy(policy_fields)
+    team = row.get('team') or u''
+    if not isinstance(team, basestring):
+        raise BadRequest('team is not text: %s' % quoted(team))
+    if len(team) > Profile._meta.get_field('team').max_length:
+        raise BadRequest('team is too long: %s' % quoted(team))
+    if row.get('as_of'):
+        as_of = to_date(row['as_of'], 'as_of')
+    return username, dict(
+        hours_avail=to_hours(row.get('hours_avail'), 'hours_avail'),
+        per_quarter=to_hours(row.get('per_quarter'), 'per_quarter'),
+        as_of=as_of, policy=policy_fields['policy'] or u'',
+        hire_date=hire_date, team=team)
+
+
+def import_batch(batch):
+    """Saves the new and changed profiles in a batch of ``(line, username,
+    fields)``, rebuilds their snapshots and marks their liability stale.
+
+    Returns ``(created, updated, errors)``, where ``errors`` has
+    ``(line, message)`` for rows of unknown users.
+    """
+    user_ids = dict(User.objects.filter(username__in=[u for _, u, _ in batch])
+                    .values_list('username', 'id'))
+    # The last row for a user wins.
+    rows, errors = {}, []
+    for line, username, fields in batch:
+        if username not in user_ids:
+            errors.append((line, 'No user called %s' % quoted(username)))
+        else:
+            rows[user_ids[username]] = fields
+    existing = dict((values[0], values[1:]) for values in
+                    Profile.objects.filter(user__in=rows.keys())
+                    .values_list('user', 'id', *Profile.DATA_FIELDS))
+    new, changed, moved = [], [], {}
+    for user_id, fields in rows.items():
+        profile = Profile(user_id=user_id, **fields)
+        if user_id not in existing:
+            new.append(profile)
+            continue
+        stored = existing[user_id]
+        if stored[1:] != tuple(fields[f] for f in Profile.DATA_FIELDS):
+            profile.id = stored[0]
+            changed.append(profile)
+            old = dict(zip(Profile.DATA_FIELDS, stored[1:]))
+            if (old['team'], old['as_of']) != (profile.team, profile.as_of):
+                moved[old['team']] = min(old['as_of'],
+                                         moved.get(old['team'], date.max))
+    Profile.objects.bulk_insert(new)
+    Profile.objects.bulk_update(changed, Profile.DATA_FIELDS + ('modified',))
+    # The bulk writes send no signals, so snapshots are rebuilt here.  That
+    # marks the profiles' new teams stale; the teams they moved from, or
+    # the months before a later as_of, are marked here.
+    for team, as_of in moved.items():
+        StaleLiability.objects.mark(team, month_start(as_of))
+    rebuild(Profile.objects.with_trips([p.user_id for p in new + changed])
+            .values())
+    return len(new), len(changed), errors
+
+
+class Command(BaseCommand):
+    args = '<export.csv, export.jsonl or ->'
+    help = ('Imports an HRIS export of PTO profiles: a CSV with a header row, '
+            'or JSON lines, with username, hours_avail, per_quarter and '
+            'optionally as_of, policy, hire_date and team. Only new and '
+            'changed profiles are written, a batch per transaction.')
+    option_list = BaseCommand.option_list + (
+        make_option('--format', choices=('csv', 'jsonl'),
+                    help='csv or jsonl (default: from the file name).'),
+        make_option('--as-of', dest='as_of',
+                    help='Date balances are current on for rows without '
+                         'an as_of (default: today).'),
+        make_option('--mmap', action='store_true', default=False,
+                    help='Read the file through mmap.'),
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=BATCH_SIZE,
+                    help='Rows compared and written per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the export file, or - for stdin.')
+        path = args[0]
+        format = options['format'] or ('jsonl' if path.endswith('.jsonl')
+                                       else 'csv')
+        if path == '-' and options['mmap']:
+            raise CommandError("--mmap can't read stdin.")
+        as_of = date.today()
+        if options['as_of']:
+            try:
+                as_of = to_date(options['as_of'], 'as-of')
+            except BadRequest as e:
+                raise CommandError(str(e))
+
+        infile = sys.stdin if path == '-' else open(path, 'rb')
+        mapped = None
+        try:
+            lines = infile
+            # An empty file can't be mapped, and has no lines anyway.
+            if options['mmap'] and os.fstat(infile.fileno()).st_size:
+                mapped = mmap.mmap(infile.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+                lines = iter(mapped.readline, '')
+            rows = (jsonl_rows if format == 'jsonl' else csv_rows)(lines)
+            self.import_rows(rows, as_of, options['batch_size'],
+                             int(options.get('verbosity', 1)))
+        finally:
+            if mapped is not None:
+                mapped.close()
+            if infile is not sys.stdin:
+                infile.close()
+
+    def import_rows(self, rows, as_of, batch_size, verbosity):
+        start = time.time()
+        self.count = self.errors = created = updated = 0
+        for batch in batches(self.read_rows(rows, as_of), batch_size):
+            with transaction.commit_on_success():
+                new, changed, bad = import_batch(batch)
+            created += new
+            updated += changed
+            self.report(bad)
+            if verbosity > 1:
+                self.stdout.write('%s rows...\n' % self.count)
+        elapsed = time.time() - start
+        self.stdout.write('Read %s rows in %.1fs (%.0f rows/s): %s created, '
+                          '%s updated, %s unchanged, %s with errors.\n'
+                          % (self.count, elapsed,
+                             self.count / max(elapsed, 1e-6), created,
+                             updated,
+                             self.count - created - updated - self.errors,
+                             self.errors))
+
+    def read_rows(self, rows, as_of):
+        """Yields ``(line, username, fields)`` for the valid rows."""
+        for line, row in rows:
+            self.count += 1
+            try:
+                username, fields = read_row(row, as_of)
+            except BadRequest as e:
+                self.report([(line, str(e))])
+            else:
+                yield line, username, fields
+
+    def report(self, errors):
+        self.errors += len(errors)
+        for line, message in errors:
+            self.stderr.write('Line %s: %s\n' % (line, message))
@@ -0,0 +1,147 @@
+from collections import deque
+import csv
+from datetime import date
+from itertools import imap
+import multiprocessing
+from optparse import make_option
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pto.accrual import hours_scale, round_fixed, to_fixed
+from pto.inputs import BadRequest, read_policy, to_date, to_hours
+
+
+def read_chunks(rows, size):
+    """Groups ``(line number, row)`` pairs from a CSV into lists of
+    ``size``, skipping blank lines and a header row."""
+    chunk = []
+    for line, row in enumerate(rows, 1):
+        if not row or (line == 1 and row[0].strip().lower() == 'id'):
+            continue
+        chunk.append((line, row))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def project_row(today, dates, row):
+    """Returns ``[id, hours on each date...]`` for an employee row."""
+    if len(row) < 3:
+        raise BadRequest('Expected id, hours_avail, per_quarter, policy')
+    hours_avail = to_hours(row[1].strip(), 'hours_avail')
+    per_quarter = to_hours(row[2].strip(), 'per_quarter')
+    fields = dict(zip(('policy', 'hire_date'),
+                      [v.strip() or None for v in row[3:5]]))
+    policy, hire_date = read_policy(fields)
+    scale = hours_scale(hours_avail, per_quarter, *policy.amounts)
+    account = policy.account(to_fixed(hours_avail, scale),
+                             to_fixed(per_quarter, scale), scale, hire_date)
+    return [row[0]] + [round_fixed(balance, scale)
+                       for balance in account.balances(today, dates)]
+
+
+def project_chunk(args):
+    """Projects a chunk of rows; this is what the worker processes run.
+
+    Returns ``(rows, errors)``: the output rows, and ``(line, message)``
+    for each input row that couldn't be read.
+    """
+    today, dates, chunk = args
+    rows, errors = [], []
+    for line, row in chunk:
+        try:
+            rows.append(project_row(today, dates, row))
+        except BadRequest as e:
+            errors.append((line, str(e)))
+    return rows, errors
+
+
+def bounded_imap(pool, func, items, window):
+    """Like ``pool.imap(func, items)``, but with at most ``window`` items
+    in flight, so ``items`` is only read as fast as results are used."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+class Command(BaseCommand):
+    args = '<employees.csv or ->'
+    help = ('Projects PTO balances for a CSV of employees (id, hours_avail, '
+            'per_quarter and optionally policy and hire_date) on the given '
+            'dates, writing a CSV of hours per date.')
+    option_list = BaseCommand.option_list + (
+        make_option('--dates',
+                    help='Comma separated YYYY-MM-DD dates to project to.'),
+        make_option('--as-of', dest='as_of',
+                    help='Date balances are current on (default: today).'),
+        make_option('--output', help='Output file (default: stdout).'),
+        make_option('--processes', type='int',
+                    default=multiprocessing.cpu_count(),
+                    help='Worker processes; 1 runs in this process.'),
+        make_option('--chunk-size', dest='chunk_size', type='int',
+                    default=1000, help='Rows sent to a worker at a time.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Give the employee CSV, or - for stdin.')
+        if not options['dates']:
+            raise CommandError('--dates is required.')
+        try:
+            dates = [to_date(d.strip(), 'dates')
+                     for d in options['dates'].split(',')]
+            today = date.today()
+            if options['as_of']:
+                today = to_date(options['as_of'], 'as-of')
+        except BadRequest as e:
+            raise CommandError(str(e))
+        processes = max(options['processes'], 1)
+
+        infile = sys.stdin if args[0] == '-' else open(args[0], 'rb')
+        outfile = self.stdout
+        if options['output']:
+            outfile = open(options['output'], 'wb')
+        writer = csv.writer(outfile)
+        writer.writerow(['id'] + [d.isoformat() for d in dates])
+        chunks = ((today, dates, chunk) for chunk in
+                  read_chunks(csv.reader(infile), options['chunk_size']))
+
+        pool = None
+        start = time.time()
+        count = errors = 0
+        try:
+            if processes == 1:
+                results = imap(project_chunk, chunks)
+            else:
+                pool = multiprocessing.Pool(processes)
+                # Two chunks a worker keeps them busy without reading the
+                # whole file ahead.
+                results = bounded_imap(pool, project_chunk, chunks,
+                                       processes * 2)
+            for rows, bad in results:
+                writer.writerows(rows)
+                count += len(rows)
+                errors += len(bad)
+                for line, message in bad:
+                    self.stderr.write('Line %s: %s\n' % (line, message))
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+            if infile is not sys.stdin:
+                infile.close()
+            if outfile is not self.stdout:
+                outfile.close()
+        elapsed = time.time() - start
+        self.stderr.write('Projected %s rows in %.1fs (%.0f rows/s) with %s '
+                          'processes; %s rows had errors.\n'
+                          % (count, elapsed, count / max(elapsed, 1e-6),
+                             processes, errors))
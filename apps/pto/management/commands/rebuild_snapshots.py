@@ -0,0 +1,42 @@
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pto import liability
+from pto.models import BATCH_SIZE, Profile, batches
+from pto.snapshots import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the balance snapshots of every stored PTO profile, or '
+            'of the given user ids, and the liability rollups they feed. '
+            'Run it after bulk loads and from cron.')
+    args = '[user_id ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=BATCH_SIZE,
+                    help='Profiles loaded and written per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            user_ids = [int(a) for a in args]
+        else:
+            user_ids = Profile.objects.values_list('user', flat=True)
+        start = time.time()
+        profiles = snapshots = 0
+        for batch in batches(user_ids, options['batch_size']):
+            with transaction.commit_on_success():
+                loaded = Profile.objects.with_trips(batch).values()
+                snapshots += rebuild(loaded)
+            profiles += len(loaded)
+            if int(options.get('verbosity', 1)) > 1:
+                self.stdout.write('%s profiles...\n' % profiles)
+        teams = liability.refresh()
+        elapsed = time.time() - start
+        self.stdout.write('Wrote %s snapshots for %s profiles and refreshed '
+                          '%s teams in %.1fs (%.0f profiles/s).\n'
+                          % (snapshots, profiles, teams, elapsed,
+                             profiles / max(elapsed, 1e-6)))
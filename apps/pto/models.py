@@ -0,0 +1,363 @@
+"""
+Stored PTO profiles and planned trips.
+
+Django 1.3 has no ``bulk_create``, so :class:`BulkManager` writes many rows
+with one ``executemany`` per batch instead of a query per object.  The SQL
+is plain enough for MySQL in production and SQLite in tests.
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connections, models, transaction
+
+
+# Rows per executemany or IN (...) list.  SQLite allows 999 parameters.
+BATCH_SIZE = 500
+
+
+def batches(items, size=BATCH_SIZE):
+    """Yields lists of up to ``size`` items from ``items``."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def to_decimal(value, places=6):
+    """Returns a SUM() from the database as a Decimal.
+
+    SQLite sums decimal columns as floats; ``repr`` keeps every digit
+    they have.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    return Decimal(value).quantize(Decimal(1).scaleb(-places))
+
+
+class BulkManager(models.Manager):
+    """A manager that inserts and updates many rows at a time.
+
+    These don't send signals, set ids on the objects or call their
+    ``save()`` methods.
+    """
+
+    def _execute_many(self, sql, rows):
+        connection = connections[self.db]
+        cursor = connection.cursor()
+        for batch in batches(rows):
+            cursor.executemany(sql, batch)
+        transaction.commit_unless_managed(using=self.db)
+
+    def _prep(self, obj, field, add):
+        return field.get_db_prep_save(field.pre_save(obj, add),
+                                      connection=connections[self.db])
+
+    def bulk_insert(self, objs):
+        """INSERTs ``objs``."""
+        qn = connections[self.db].ops.quote_name
+        meta = self.model._meta
+        fields = [f for f in meta.local_fields
+                  if not isinstance(f, models.AutoField)]
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            qn(meta.db_table), ', '.join(qn(f.column) for f in fields),
+            ', '.join(['%s'] * len(fields)))
+        self._execute_many(sql, ([self._prep(obj, f, True) for f in fields]
+                                 for obj in objs))
+
+    def bulk_update(self, objs, names):
+        """UPDATEs the fields called ``names`` on ``objs``, by primary key."""
+        qn = connections[self.db].ops.quote_name
+        meta = self.model._meta
+        fields = [meta.get_field(name) for name in names]
+        sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+            qn(meta.db_table), ', '.join('%s = %%s' % qn(f.column)
+                                         for f in fields),
+            qn(meta.pk.column))
+        self._execute_many(sql, ([self._prep(obj, f, False)
+                                  for f in fields] + [obj.pk]
+                                 for obj in objs))
+
+
+class ProfileManager(BulkManager):
+
+    def with_trips(self, user_ids):
+        """Returns ``{user id: profile}`` with each profile's trips loaded.
+
+        Profiles and trips come back in one query (per ``BATCH_SIZE``
+        users), and ``profile.trip_list`` is the trips in date order.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        profile_fields = Profile._meta.fields
+        trip_fields = Trip._meta.fields
+        columns = (['p.%s' % qn(f.column) for f in profile_fields] +
+                   ['t.%s' % qn(f.column) for f in trip_fields])
+        sql = ('SELECT %s FROM %s p LEFT OUTER JOIN %s t ON t.%s = p.%s '
+               'WHERE p.%s IN (%%s) ORDER BY p.%s, t.%s, t.%s' % (
+                   ', '.join(columns), qn(Profile._meta.db_table),
+                   qn(Trip._meta.db_table),
+                   qn(Trip._meta.get_field('profile').column),
+                   qn(Profile._meta.pk.column),
+                   qn(Profile._meta.get_field('user').column),
+                   qn(Profile._meta.pk.column),
+                   qn(Trip._meta.get_field('start_date').column),
+                   qn(Trip._meta.pk.column)))
+        profiles = {}
+        for batch in batches(user_ids):
+            cursor = connection.cursor()
+            cursor.execute(sql % ', '.join(['%s'] * len(batch)), batch)
+            split = len(profile_fields)
+            profile = None
+            for row in cursor.fetchall():
+                if profile is None or profile.id != row[0]:
+                    profile = Profile(*[f.to_python(v) for f, v in
+                                        zip(profile_fields, row[:split])])
+                    profile.trip_list = []
+                    profiles[profile.user_id] = profile
+                if row[split] is not None:
+                    profile.trip_list.append(
+                        Trip(*[f.to_python(v) for f, v in
+                               zip(trip_fields, row[split:])]))
+        return profiles
+
+    def for_user(self, user_id):
+        """Returns the user's profile with its trips, or None."""
+        return self.with_trips([user_id]).get(user_id)
+
+
+class Profile(models.Model):
+    """What a user last told us about their PTO.
+
+    ``hours_avail`` is the balance on ``as_of``; projections accrue from
+    there under ``policy`` (the default policy if blank).
+    """
+    user = models.OneToOneField(User, related_name='pto_profile')
+    hours_avail = models.DecimalField(max_digits=12, decimal_places=6)
+    per_quarter = models.DecimalField(max_digits=12, decimal_places=6)
+    as_of = models.DateField()
+    policy = models.CharField(max_length=64, blank=True)
+    hire_date = models.DateField(null=True, blank=True)
+    team = models.CharField(max_length=64, blank=True, db_index=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = ProfileManager()
+
+    # What an import compares and overwrites.
+    DATA_FIELDS = ('hours_avail', 'per_quarter', 'as_of', 'policy',
+                   'hire_date', 'team')
+
+    class Meta:
+        db_table = 'pto_profiles'
+
+    def __unicode__(self):
+        return u'PTO profile for user %s' % self.user_id
+
+
+class Trip(models.Model):
+    """A planned trip and the PTO hours it will cost."""
+    profile = models.ForeignKey(Profile, related_name='trips')
+    start_date = models.DateField(db_index=True)
+    end_date = models.DateField(null=True, blank=True)
+    hours = models.DecimalField(max_digits=12, decimal_places=6)
+
+    objects = BulkManager()
+
+    class Meta:
+        db_table = 'pto_trips'
+        ordering = ('start_date',)
+
+    def __unicode__(self):
+        return u'%s hours from %s' % (self.hours, self.start_date)
+
+
+class SnapshotManager(BulkManager):
+
+    def delete_for(self, profile_ids, since=None):
+        """Deletes the profiles' snapshots, or just those from ``since`` on.
+
+        Done in SQL, since ``QuerySet.delete()`` loads every row first.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        meta = self.model._meta
+        for batch in batches(profile_ids):
+            sql = 'DELETE FROM %s WHERE %s IN (%s)' % (
+                qn(meta.db_table), qn(meta.get_field('profile').column),
+                ', '.join(['%s'] * len(batch)))
+            params = list(batch)
+            if since is not None:
+                sql += ' AND %s >= %%s' % qn(meta.get_field('date').column)
+                params.append(connection.ops.value_to_db_date(since))
+            connection.cursor().execute(sql, params)
+        transaction.commit_unless_managed(using=self.db)
+
+    def balances_on(self, day, profile_ids=None):
+        """Returns ``{profile id: hours}`` for every profile's latest
+        snapshot on or before ``day``, in one query.
+
+        The inner query is a group-wise max over the (profile, date)
+        index; the join then reads one row per profile.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        meta = self.model._meta
+        table = qn(meta.db_table)
+        profile = qn(meta.get_field('profile').column)
+        date_column = qn(meta.get_field('date').column)
+        where = ''
+        params = [connection.ops.value_to_db_date(day)]
+        if profile_ids is not None:
+            if not profile_ids:
+                return {}
+            where = ' AND %s IN (%s)' % (profile,
+                                         ', '.join(['%s'] * len(profile_ids)))
+            params += list(profile_ids)
+        sql = ('SELECT s.%(profile)s, s.%(hours)s FROM %(table)s s '
+               'INNER JOIN (SELECT %(profile)s, MAX(%(date)s) AS latest '
+               'FROM %(table)s WHERE %(date)s <= %%s%(where)s '
+               'GROUP BY %(profile)s) m '
+               'ON s.%(profile)s = m.%(profile)s AND s.%(date)s = m.latest'
+               % dict(table=table, profile=profile, date=date_column,
+                      hours=qn(meta.get_field('hours').column), where=where))
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        hours = meta.get_field('hours')
+        return dict((profile_id, hours.to_python(value))
+                    for profile_id, value in cursor.fetchall())
+
+    def team_totals(self, day, teams):
+        """Returns ``{team: hours}``, the sum of the latest snapshot on or
+        before ``day`` of every profile on each of ``teams``, in one query.
+
+        Like :meth:`balances_on`, grouped by the profile's team.
+        """
+        if not teams:
+            return {}
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        meta = self.model._meta
+        sql = ('SELECT p.%(team)s, SUM(s.%(hours)s) FROM %(table)s s '
+               'INNER JOIN (SELECT i.%(profile)s, MAX(i.%(date)s) AS latest '
+               'FROM %(table)s i INNER JOIN %(profiles)s ip '
+               'ON ip.%(id)s = i.%(profile)s '
+               'WHERE i.%(date)s <= %%s AND ip.%(team)s IN (%(teams)s) '
+               'GROUP BY i.%(profile)s) m '
+               'ON s.%(profile)s = m.%(profile)s AND s.%(date)s = m.latest '
+               'INNER JOIN %(profiles)s p ON p.%(id)s = s.%(profile)s '
+               'GROUP BY p.%(team)s'
+               % dict(table=qn(meta.db_table),
+                      profile=qn(meta.get_field('profile').column),
+                      date=qn(meta.get_field('date').column),
+                      hours=qn(meta.get_field('hours').column),
+                      profiles=qn(Profile._meta.db_table),
+                      id=qn(Profile._meta.pk.column),
+                      team=qn(Profile._meta.get_field('team').column),
+                      teams=', '.join(['%s'] * len(teams))))
+        cursor = connection.cursor()
+        cursor.execute(sql, [connection.ops.value_to_db_date(day)] +
+                       list(teams))
+        return dict((team, to_decimal(total))
+                    for team, total in cursor.fetchall())
+
+
+class BalanceSnapshot(models.Model):
+    """A profile's balance on one of its accrual dates, trips taken.
+
+    There is also one on the profile's ``as_of`` date, so the latest
+    snapshot on or before a date always gives the balance then.  See
+    :mod:`pto.snapshots`.
+    """
+    profile = models.ForeignKey(Profile, related_name='snapshots')
+    date = models.DateField(db_index=True)
+    hours = models.DecimalField(max_digits=16, decimal_places=6)
+
+    objects = SnapshotManager()
+
+    class Meta:
+        db_table = 'pto_balance_snapshots'
+        unique_together = ('profile', 'date')
+
+    def __unicode__(self):
+        return u'%s hours on %s' % (self.hours, self.date)
+
+
+class LiabilityRollup(models.Model):
+    """The sum of a team's balances at the end of a month.
+
+    ``month`` is the first of the month.  See :mod:`pto.liability`.
+    """
+    month = models.DateField()
+    team = models.CharField(max_length=64, blank=True)
+    hours = models.DecimalField(max_digits=20, decimal_places=6)
+
+    objects = BulkManager()
+
+    class Meta:
+        db_table = 'pto_liability_rollups'
+        unique_together = ('month', 'team')
+
+    def __unicode__(self):
+        return u'%s hours for %r in %s' % (self.hours, self.team,
+                                           self.month.strftime('%Y-%m'))
+
+
+class StaleManager(models.Manager):
+
+    def mark(self, team, since):
+        """Marks ``team``'s rollups stale from the month ``since`` on.
+
+        An earlier mark is kept.  Safe against concurrent marks: if
+        another one inserts the team's row first, this one moves it.
+        """
+        if self.filter(team=team, since__gt=since).update(since=since):
+            return
+        if self.filter(team=team).exists():
+            return
+        sid = transaction.savepoint(using=self.db)
+        try:
+            self.create(team=team, since=since)
+        except IntegrityError:
+            transaction.savepoint_rollback(sid, using=self.db)
+            self.filter(team=team, since__gt=since).update(since=since)
+        else:
+            transaction.savepoint_commit(sid, using=self.db)
+
+    def claim(self, team, since):
+        """Deletes ``team``'s mark if it is still from ``since``.
+
+        Returns whether it was, so of two concurrent refreshes only one
+        recomputes the team.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        meta = self.model._meta
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM %s WHERE %s = %%s AND %s = %%s'
+                       % (qn(meta.db_table), qn(meta.get_field('team').column),
+                          qn(meta.get_field('since').column)),
+                       [team, connection.ops.value_to_db_date(since)])
+        return cursor.rowcount > 0
+
+
+class StaleLiability(models.Model):
+    """A team whose rollups need recomputing from ``since`` on."""
+    team = models.CharField(max_length=64, blank=True, unique=True)
+    since = models.DateField()
+
+    objects = StaleManager()
+
+    class Meta:
+        db_table = 'pto_liability_stale'
+
+    def __unicode__(self):
+        return u'%r stale since %s' % (self.team, self.since)
+
+
+# Connect the signal handlers that keep snapshots and rollups up to date.
+# Imported by their full names so importing them first still works.
+import pto.snapshots
+import pto.liability
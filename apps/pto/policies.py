@@ -0,0 +1,275 @@
+"""
+Accrual policies.
+
+A policy says when PTO accrues and what limits apply.  Policies are
+declared in ``settings.PTO_ACCRUAL_POLICIES``, a dict of names to options:
+
+``schedule``
+    ``'semimonthly'`` (the 1st and 15th; the default) or ``'biweekly'``.
+``anchor``
+    For biweekly policies, any pay date (``YYYY-MM-DD``).  Accruals fall
+    every 14 days before and after it.
+``tiers``
+    ``[(years, hours), ...]``: once someone has ``years`` of service, each
+    accrual is ``hours`` rather than their own ``per_quarter``.  Tiers need
+    a hire date; without one ``per_quarter`` applies throughout.
+``cap``
+    Nothing accrues while the balance is at or above this many hours.
+``carryover``
+    At the first accrual of each year, a balance above this many hours is
+    cut down to it.
+
+Each policy is compiled once, into an index of its accrual dates (see
+:class:`~pto.accrual.AccrualCalendar`) and its limits, and kept until
+:func:`commons.lazy.reset`.  An :class:`Account` then works a balance out
+a stretch at a time between tier changes and year starts, with one
+multiplication per stretch, so the cost grows with the number of those
+rather than with the number of accruals.  A policy with no tiers, cap or
+carry-over is a single stretch.
+
+Amounts are fixed-point integers, as in :mod:`pto.accrual`.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from commons.lazy import memoize
+
+from .accrual import AccrualCalendar, accrual_calendar, to_fixed
+
+
+def biweekly_dates(anchor):
+    """Returns a schedule of every 14th day before and after ``anchor``."""
+    def dates(start, end):
+        day = start + timedelta(days=(anchor - start).days % 14)
+        while day <= end:
+            yield day
+            if (end - day).days < 14:
+                break
+            day += timedelta(days=14)
+    return dates
+
+
+def anniversary(day, years):
+    """Returns the date ``years`` years after ``day``."""
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # February 29th.
+        return date(day.year + years, 3, 1)
+
+
+def _date(value, name):
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ImproperlyConfigured('%s must be a YYYY-MM-DD date' % name)
+
+
+def _hours(value, name):
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value))
+    except ArithmeticError:
+        raise ImproperlyConfigured('%s must be a number of hours' % name)
+
+
+class AccrualPolicy(object):
+    """A compiled policy; see the module docstring for the options."""
+
+    def __init__(self, name, schedule='semimonthly', anchor=None, tiers=(),
+                 cap=None, carryover=None):
+        self.name = name
+        where = 'PTO_ACCRUAL_POLICIES[%r]' % name
+        if schedule == 'semimonthly':
+            self.calendar = accrual_calendar
+        elif schedule == 'biweekly':
+            if anchor is None:
+                raise ImproperlyConfigured('%s needs an anchor' % where)
+            anchor = _date(anchor, where + ' anchor')
+            self.calendar = AccrualCalendar(schedule=biweekly_dates(anchor))
+        else:
+            raise ImproperlyConfigured('%s has an unknown schedule: %r'
+                                       % (where, schedule))
+        self.tiers = sorted((int(years), _hours(hours, where + ' tiers'))
+                            for years, hours in tiers)
+        self.cap = _hours(cap, where + ' cap')
+        self.carryover = _hours(carryover, where + ' carryover')
+        # Pass these to hours_scale() so they fit the scale exactly.
+        self.amounts = [hours for _, hours in self.tiers]
+        self.amounts += [v for v in (self.cap, self.carryover)
+                         if v is not None]
+
+    def __repr__(self):
+        return '<AccrualPolicy %s>' % self.name
+
+    def account(self, hours_avail, per_quarter, scale, hire_date=None):
+        """Returns an :class:`Account` for one person under this policy."""
+        return Account(self, hours_avail, per_quarter, scale, hire_date)
+
+
+class Account(object):
+    """One person's balance under a policy.
+
+    ``hours_avail`` and ``per_quarter`` are fixed-point integers at
+    ``scale``, which must also fit the policy's ``amounts``.
+    """
+
+    def __init__(self, policy, hours_avail, per_quarter, scale,
+                 hire_date=None):
+        self.calendar = policy.calendar
+        self.hours_avail = hours_avail
+        # (first date ordinal, hours per accrual), in date order.
+        self.rates = [(0, per_quarter)]
+        if hire_date is not None:
+            self.rates += [(anniversary(hire_date, years).toordinal(),
+                            to_fixed(hours, scale))
+                           for years, hours in policy.tiers]
+        self.cap = self.carryover = None
+        if policy.cap is not None:
+            self.cap = to_fixed(policy.cap, scale)
+        if policy.carryover is not None:
+            self.carryover = to_fixed(policy.carryover, scale)
+
+    def _stretches(self, ordinals, i, j):
+        """Yields ``(i, j, rate, new_year)`` for runs of accruals ``i`` to
+        ``j - 1`` with the same rate and in the same year."""
+        starts = [bisect_left(ordinals, first) for first, _ in self.rates]
+        while i < j:
+            k = bisect_right(starts, i) - 1
+            stop = j
+            if k + 1 < len(starts):
+                stop = min(stop, starts[k + 1])
+            new_year = False
+            if self.carryover is not None:
+                year = date.fromordinal(ordinals[i]).year
+                new_year = (i == 0 or
+                            date.fromordinal(ordinals[i - 1]).year != year)
+                if year < date.max.year:
+                    stop = min(stop, bisect_left(
+                        ordinals, date(year + 1, 1, 1).toordinal(), i))
+            yield i, stop, self.rates[k][1], new_year
+            i = stop
+
+    def _step(self, balance, count, rate, new_year):
+        """Returns ``balance`` after ``count`` accruals of ``rate``."""
+        if new_year:
+            balance = min(balance, self.carryover)
+        if self.cap is None:
+            return balance + rate * count
+        if balance < self.cap:
+            return min(self.cap, balance + rate * count)
+        return balance
+
+    def _accrue(self, balance, ordinals, i, j):
+        for start, stop, rate, new_year in self._stretches(ordinals, i, j):
+            balance = self._step(balance, stop - start, rate, new_year)
+        return balance
+
+    def balance(self, start, end):
+        """Returns the balance on ``end`` after accruing from ``start``."""
+        ordinals, i, j = self.calendar.span(start, end)
+        return self._accrue(self.hours_avail, ordinals, i, j)
+
+    def balances(self, start, ends):
+        """Returns the balance on each of ``ends``, in one pass."""
+        if not ends:
+            return []
+        ordinals, i, _ = self.calendar.span(start, max(ends))
+        results = [None] * len(ends)
+        balance = self.hours_avail
+        for n in sorted(range(len(ends)), key=lambda n: ends[n]):
+            j = max(bisect_right(ordinals, ends[n].toordinal()), i)
+            balance = self._accrue(balance, ordinals, i, j)
+            results[n] = balance
+            i = j
+        return results
+
+    def earliest_date(self, target, start, end):
+        """Returns the first date from ``start`` to ``end`` with ``target``.
+
+        That is ``start`` if the balance is already there, otherwise the
+        accrual date that gets it there, or None if it isn't reached by
+        ``end``.  Solved a stretch at a time, like :meth:`balance`.
+        """
+        balance = self.hours_avail
+        if balance >= target:
+            return start
+        ordinals, i, j = self.calendar.span(start, end)
+        reachable = self.cap is None or target <= self.cap
+        for first, stop, rate, new_year in self._stretches(ordinals, i, j):
+            if new_year:
+                balance = min(balance, self.carryover)
+            if reachable and rate > 0:
+                needed = -(-(target - balance) // rate)  # Rounded up.
+                if needed <= stop - first:
+                    return date.fromordinal(ordinals[first + needed - 1])
+            balance = self._step(balance, stop - first, rate, False)
+        return None
+
+    def plan_trips(self, start, trips):
+        """Checks a list of trips against the balance in one pass.
+
+        ``trips`` is a list of ``(date, hours)`` pairs in date order.
+        Yields ``(available, left)`` for each: the balance on the trip's
+        first day with the earlier trips taken, and what is left after
+        this one.  Every trip is deducted whether or not the balance
+        covers it.
+        """
+        if not trips:
+            return
+        ordinals, i, _ = self.calendar.span(start, trips[-1][0])
+        balance = self.hours_avail
+        for day, hours in trips:
+            j = max(bisect_right(ordinals, day.toordinal()), i)
+            balance = self._accrue(balance, ordinals, i, j)
+            i = j
+            yield balance, balance - hours
+            balance -= hours
+
+    def timeline(self, start, end, trips=()):
+        """Yields ``(date, balance)`` for every accrual date up to ``end``.
+
+        Each balance includes that day's accrual and every trip in
+        ``trips``, ``(date, hours)`` pairs, starting on or before it.
+        """
+        trips = sorted(trips)
+        next_trip = 0
+        balance = self.hours_avail
+        ordinals, i, j = self.calendar.span(start, end)
+        for first, stop, rate, new_year in self._stretches(ordinals, i, j):
+            for n in range(first, stop):
+                balance = self._step(balance, 1, rate,
+                                     new_year and n == first)
+                day = date.fromordinal(ordinals[n])
+                while next_trip < len(trips) and trips[next_trip][0] <= day:
+                    balance -= trips[next_trip][1]
+                    next_trip += 1
+                yield day, balance
+
+
+@memoize
+def compiled_policies():
+    """Compiles every policy in ``settings.PTO_ACCRUAL_POLICIES``."""
+    policies = {}
+    for name, options in settings.PTO_ACCRUAL_POLICIES.items():
+        try:
+            policies[name] = AccrualPolicy(name, **options)
+        except TypeError as e:
+            raise ImproperlyConfigured(
+                'PTO_ACCRUAL_POLICIES[%r]: %s' % (name, e))
+    return policies
+
+
+def get_policy(name=None):
+    """Returns the policy called ``name``, or the default one.
+
+    Raises KeyError if there is no such policy.
+    """
+    return compiled_policies()[name or settings.PTO_DEFAULT_POLICY]
@@ -0,0 +1,170 @@
+"""
+Materialized balance snapshots.
+
+Every stored profile has a :class:`~pto.models.BalanceSnapshot` for each
+of its accrual dates from its ``as_of`` date to the end of the year
+``settings.PTO_SNAPSHOT_YEARS`` from now, with its trips taken as
+:meth:`pto.policies.Account.timeline` takes them.  The balance of every
+user on a date is then one query; see
+:meth:`~pto.models.SnapshotManager.balances_on`.
+
+Saving or deleting a trip only recomputes the snapshots from the trip's
+date on, carrying on from the balance in the snapshot before it.  Saving
+a profile recomputes all of its snapshots.  The bulk paths in
+:mod:`pto.models` send no signals, so run the ``rebuild_snapshots``
+command after using them, and from cron so snapshots keep reaching far
+enough ahead.
+
+Whenever snapshots are rewritten, :data:`snapshots_changed` is sent with
+the ``profiles`` and the date they changed ``since`` (None for all of
+them).
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import signals
+from django.dispatch import Signal
+
+from .accrual import hours_scale, to_fixed
+from .models import BalanceSnapshot, Profile, Trip
+from .policies import get_policy
+
+
+snapshots_changed = Signal(providing_args=['profiles', 'since'])
+
+
+def snapshot_end(today=None):
+    """Returns the last date snapshots are kept for."""
+    today = today or date.today()
+    return date(min(today.year + settings.PTO_SNAPSHOT_YEARS, date.max.year),
+                12, 31)
+
+
+def account_for(profile, trips, hours_avail=None):
+    """Returns ``(account, scale)`` for a stored profile.
+
+    ``hours_avail`` is the balance to start from instead of the profile's.
+    """
+    if hours_avail is None:
+        hours_avail = profile.hours_avail
+    policy = get_policy(profile.policy or None)
+    # Stored Decimals carry every decimal place the column has; normalize
+    # them so the scale only grows for places that are used.
+    scale = hours_scale(*[v.normalize() for v in
+                          [hours_avail, profile.per_quarter] +
+                          [t.hours for t in trips] + policy.amounts])
+    return policy.account(to_fixed(hours_avail, scale),
+                          to_fixed(profile.per_quarter, scale), scale,
+                          profile.hire_date), scale
+
+
+def build(profile, trips, start=None, hours_avail=None, end=None):
+    """Returns the snapshots for ``profile`` from ``start`` to ``end``.
+
+    Without ``start``, they start from the profile's ``as_of`` date and
+    balance.  Otherwise ``hours_avail`` is the balance just before
+    ``start`` and trips before it are taken to be accounted for.
+    """
+    first = start or profile.as_of
+    end = end or snapshot_end()
+    trips = [t for t in trips if t.start_date >= first]
+    account, scale = account_for(profile, trips, hours_avail)
+    fixed_trips = [(t.start_date, to_fixed(t.hours, scale)) for t in trips]
+    snapshots = [BalanceSnapshot(profile_id=profile.id, date=day,
+                                 hours=Decimal(balance) / scale)
+                 for day, balance in account.timeline(first, end,
+                                                      fixed_trips)]
+    if start is None and (not snapshots or snapshots[0].date != first):
+        snapshots.insert(0, BalanceSnapshot(profile_id=profile.id,
+                                            date=first,
+                                            hours=profile.hours_avail))
+    return snapshots
+
+
+def refresh(profile, since=None, trips=None):
+    """Recomputes ``profile``'s snapshots from ``since`` on.
+
+    The snapshots before ``since`` are kept.  Without ``since``, or if
+    there are no snapshots before it, they are all rebuilt.
+    """
+    if trips is None:
+        trips = list(profile.trips.all())
+    start = hours_avail = None
+    if since is not None:
+        # The snapshot on the as_of date may be from before that day's
+        # trips, so carry on from a later one.
+        last = (BalanceSnapshot.objects.filter(profile=profile,
+                                               date__gt=profile.as_of,
+                                               date__lt=since)
+                .order_by('-date')[:1])
+        if last:
+            start = last[0].date + timedelta(days=1)
+            hours_avail = last[0].hours
+    BalanceSnapshot.objects.delete_for([profile.id], since=start)
+    BalanceSnapshot.objects.bulk_insert(build(profile, trips, start,
+                                              hours_avail))
+    snapshots_changed.send(sender=BalanceSnapshot, profiles=[profile],
+                           since=start)
+
+
+def rebuild(profiles):
+    """Rebuilds the snapshots of ``profiles``, loaded with their trips by
+    :meth:`~pto.models.ProfileManager.with_trips`.  Returns how many
+    snapshots were written."""
+    end = snapshot_end()
+    snapshots = []
+    for profile in profiles:
+        snapshots += build(profile, profile.trip_list, end=end)
+    BalanceSnapshot.objects.delete_for([p.id for p in profiles])
+    BalanceSnapshot.objects.bulk_insert(snapshots)
+    snapshots_changed.send(sender=BalanceSnapshot, profiles=profiles,
+                           since=None)
+    return len(snapshots)
+
+
+def balance_on(profile, day, trips=None):
+    """Returns a stored profile's balance on ``day``, in hours.
+
+    Snapshots are read when they cover ``day``; otherwise the balance is
+    worked out.  Returns None if ``day`` is before the profile's ``as_of``
+    date.
+    """
+    if day < profile.as_of:
+        return None
+    if day <= snapshot_end():
+        hours = BalanceSnapshot.objects.balances_on(day, [profile.id])
+        if profile.id in hours:
+            return hours[profile.id]
+    if trips is None:
+        trips = list(profile.trips.all())
+    return build(profile, trips, end=day)[-1].hours
+
+
+def _remember_start_date(sender, instance, **kwargs):
+    # So a trip moved to a later date refreshes from where it used to be.
+    instance._saved_start_date = instance.start_date
+
+
+def _trip_changed(sender, instance, **kwargs):
+    since = instance.start_date
+    saved = getattr(instance, '_saved_start_date', None)
+    if saved is not None and saved < since:
+        since = saved
+    instance._saved_start_date = instance.start_date
+    try:
+        profile = Profile.objects.get(pk=instance.profile_id)
+    except Profile.DoesNotExist:
+        # The profile is being deleted along with its trips.
+        return
+    refresh(profile, since)
+
+
+def _profile_changed(sender, instance, **kwargs):
+    refresh(instance)
+
+
+signals.post_init.connect(_remember_start_date, sender=Trip)
+signals.post_save.connect(_trip_changed, sender=Trip)
+signals.post_delete.connect(_trip_changed, sender=Trip)
+signals.post_save.connect(_profile_changed, sender=Profile)
@@ -0,0 +1,94 @@
+"""
+Celery tasks for projections too slow to run in a web request.
+
+Each task is given the id of a job made by :func:`pto.jobs.create` and
+stores its result rows there a chunk at a time.  The views in
+:mod:`pto.views` start them and serve the results.
+"""
+from datetime import date
+
+from celery.task import task
+from django.conf import settings
+from django.core.cache import cache
+
+from . import jobs, liability
+from .models import BalanceSnapshot, Profile, batches
+from .policies import get_policy
+from .snapshots import balance_on, snapshot_end
+from .views import format_hours, timeline_rows
+
+
+@task(ignore_result=True)
+def balance_timeline(job_id, policy, hire_date, hours_avail, per_quarter,
+                     end, trips):
+    """Stores the rows of a :func:`~pto.views.balance_timeline`.
+
+    ``policy`` is the policy's name; the rest are as
+    :func:`~pto.views.read_timeline` returns them.
+    """
+    today = date.today()
+    policy = get_policy(policy)
+    total = policy.calendar.count(today, end)
+    jobs.store(job_id, timeline_rows(today, policy, hire_date, hours_avail,
+                                     per_quarter, end, trips), total)
+
+
+@task(ignore_result=True)
+def balance_report(job_id, dates):
+    """Stores ``[user id, [hours, days] or None on each date...]`` for
+    every stored profile.
+
+    The balance is None on dates before the profile's ``as_of``.
+    """
+    user_ids = list(Profile.objects.values_list('user', flat=True))
+    jobs.store(job_id, report_rows(user_ids, dates), len(user_ids))
+
+
+# Held from when a refresh_liability task is queued until it is done.
+LIABILITY_LOCK = 'pto:liability-refresh'
+
+
+def queue_liability_refresh():
+    """Queues :func:`refresh_liability` unless one is already queued."""
+    if cache.add(LIABILITY_LOCK, 1, settings.PTO_JOB_TTL):
+        try:
+            refresh_liability.delay()
+        except Exception:
+            cache.delete(LIABILITY_LOCK)
+            raise
+
+
+@task(ignore_result=True)
+def refresh_liability():
+    """Recomputes the stale liability rollups; see
+    :func:`pto.liability.refresh`."""
+    try:
+        liability.refresh()
+    finally:
+        cache.delete(LIABILITY_LOCK)
+
+
+def report_rows(user_ids, dates):
+    end = snapshot_end()
+    for batch in batches(user_ids):
+        profiles = Profile.objects.with_trips(batch)
+        ids = [p.id for p in profiles.values()]
+        # One query per date for the whole batch.
+        stored = [BalanceSnapshot.objects.balances_on(day, ids)
+                  for day in dates]
+        for user_id in batch:
+            profile = profiles.get(user_id)
+            if profile is None:
+                # Deleted since the job started.
+                continue
+            row = [user_id]
+            for day, hours in zip(dates, stored):
+                balance = None
+                if profile.as_of <= day <= end:
+                    balance = hours.get(profile.id)
+                if balance is None:
+                    balance = balance_on(profile, day, profile.trip_list)
+                if balance is not None:
+                    balance = list(format_hours(balance))
+                row.append(balance)
+            yield row
@@ -1,4 +0,0 @@
-
-
-def test():
-    assert 0
\ No newline at end of file
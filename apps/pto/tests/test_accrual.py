@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+
+from nose.tools import assert_raises, eq_
+import test_utils
+
+from pto.accrual import (AccrualCalendar, accrual_date, accrual_dates,
+                         accrual_index, count_accruals, hours_scale,
+                         round_fixed, to_fixed)
+
+
+def count_by_day(start, end):
+    """Counts accrual days by walking the calendar one day at a time."""
+    count = 0
+    while start <= end:
+        if start.day in (1, 15):
+            count += 1
+        start += timedelta(days=1)
+    return count
+
+
+class AccrualTest(test_utils.TestCase):
+
+    def test_matches_calendar_walk(self):
+        start = date(2011, 1, 1)
+        for offset in range(0, 800, 7):
+            for length in (0, 1, 13, 14, 15, 45, 400):
+                a = start + timedelta(days=offset)
+                b = a + timedelta(days=length)
+                eq_(count_accruals(a, b), count_by_day(a, b))
+
+    def test_inclusive_bounds(self):
+        eq_(count_accruals(date(2011, 7, 1), date(2011, 7, 1)), 1)
+        eq_(count_accruals(date(2011, 7, 1), date(2011, 7, 15)), 2)
+        eq_(count_accruals(date(2011, 7, 2), date(2011, 7, 14)), 0)
+
+    def test_end_before_start(self):
+        eq_(count_accruals(date(2011, 7, 15), date(2011, 7, 1)), 0)
+
+    def test_march_1st_in_non_leap_year(self):
+        eq_(count_accruals(date(2011, 2, 1), date(2011, 3, 1)), 3)
+        eq_(count_accruals(date(2012, 2, 1), date(2012, 3, 1)), 3)
+
+    def test_far_future(self):
+        eq_(count_accruals(date(2011, 1, 1), date(9999, 12, 31)),
+            (9999 - 2011 + 1) * 24)
+
+    def test_accrual_date_round_trip(self):
+        for day in (date(2011, 1, 1), date(2011, 1, 15), date(2011, 12, 15),
+                    date(2012, 2, 1)):
+            eq_(accrual_date(accrual_index(day)), day)
+
+    def test_accrual_dates(self):
+        eq_(list(accrual_dates(date(2011, 6, 15), date(2011, 8, 1))),
+            [date(2011, 6, 15), date(2011, 7, 1), date(2011, 7, 15),
+             date(2011, 8, 1)])
+        eq_(list(accrual_dates(date(2011, 6, 16), date(2011, 6, 30))), [])
+
+
+class AccrualCalendarTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.calendar = AccrualCalendar(years=2)
+
+    def test_count_matches_closed_form(self):
+        start = date.today()
+        for length in (0, 1, 14, 15, 100, 700):
+            end = start + timedelta(days=length)
+            eq_(self.calendar.count(start, end), count_accruals(start, end))
+
+    def test_count_many(self):
+        start = date.today()
+        ends = [start - timedelta(days=40), start,
+                start + timedelta(days=400)]
+        eq_(list(self.calendar.count_many(start, ends)),
+            [count_accruals(start, end) for end in ends])
+
+    def test_grows_past_window(self):
+        start = date.today()
+        end = date(start.year + 50, 6, 1)
+        eq_(self.calendar.count(start, end), count_accruals(start, end))
+        early = date(1990, 1, 10)
+        eq_(self.calendar.count(early, start), count_accruals(early, start))
+
+    def test_dates(self):
+        eq_(list(self.calendar.dates(date(2011, 6, 15), date(2011, 8, 1))),
+            list(accrual_dates(date(2011, 6, 15), date(2011, 8, 1))))
+        eq_(list(self.calendar.dates(date(2011, 8, 1), date(2011, 6, 1))),
+            [])
+
+
+class FixedPointTest(test_utils.TestCase):
+
+    def test_scale(self):
+        eq_(hours_scale(Decimal('5.19'), Decimal('3')),
+            settings.PTO_HOURS_SCALE)
+        eq_(hours_scale(Decimal('5.19'), Decimal('0.12345')),
+            max(settings.PTO_HOURS_SCALE, 100000))
+
+    def test_to_fixed(self):
+        eq_(to_fixed(Decimal('5.19'), 100), 519)
+        eq_(to_fixed(Decimal('-2'), 100), -200)
+        assert_raises(ValueError, to_fixed, Decimal('5.191'), 100)
+
+    def test_round_fixed_matches_decimal_rounding(self):
+        for hours in ('0', '10', '5.19', '0.125', '2.675', '-3.335',
+                      '1234.5678'):
+            value = Decimal(hours)
+            scale = hours_scale(value)
+            eq_(round_fixed(to_fixed(value, scale), scale),
+                Decimal(str(round(value, 2))))
+            eq_(round_fixed(to_fixed(value, scale), scale, 8),
+                Decimal(str(round(value / 8, 2))))
+
+    def test_round_fixed_output(self):
+        eq_(str(round_fixed(1000, 100)), '10.0')
+        eq_(str(round_fixed(100, 100, 8)), '0.13')
@@ -0,0 +1,30 @@
+from datetime import date
+
+from nose.tools import assert_raises, eq_
+import test_utils
+
+from pto.dates import DateParser
+
+
+class DateParserTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.parse = DateParser(10)
+
+    def test_iso(self):
+        eq_(self.parse('2011-07-01'), date(2011, 7, 1))
+        eq_(self.parse.fallbacks, 0)
+
+    def test_fallback(self):
+        eq_(self.parse('July 1, 2011'), date(2011, 7, 1))
+        eq_(self.parse('2011-7-1'), date(2011, 7, 1))
+        eq_(self.parse.fallbacks, 2)
+
+    def test_invalid_iso_date(self):
+        assert_raises(ValueError, self.parse, '2011-02-30')
+
+    def test_cached(self):
+        self.parse('July 1, 2011')
+        self.parse('July 1, 2011')
+        eq_(self.parse.fallbacks, 1)
+        eq_(self.parse.stats()['hits'], 1)
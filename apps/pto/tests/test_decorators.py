@@ -0,0 +1,45 @@
+from datetime import date
+from decimal import Decimal
+import json
+
+from django import http
+
+from nose.tools import eq_
+import test_utils
+
+from pto.decorators import json_stream, json_view
+
+
+class JSONViewTest(test_utils.TestCase):
+
+    def test_decimals_and_dates(self):
+        view = json_view(lambda request: dict(hours=Decimal('5.190'),
+                                              day=date(2011, 7, 1)))
+        response = view(None)
+        eq_(response['Content-Type'], 'application/json')
+        eq_(json.loads(response.content),
+            dict(hours='5.190', day='2011-07-01'))
+
+    def test_streams_generators(self):
+        view = json_view(lambda request: (i * 2 for i in range(250)))
+        response = view(None)
+        eq_(json.loads(response.content), [i * 2 for i in range(250)])
+
+    def test_custom_serializer(self):
+        view = json_view(serializer=lambda obj: 'custom')(
+            lambda request: {})
+        eq_(view(None).content, 'custom')
+
+    def test_passes_responses_through(self):
+        response = http.HttpResponse('ok')
+        eq_(json_view(lambda request: response)(None), response)
+
+
+class JSONStreamTest(test_utils.TestCase):
+
+    def test_chunks(self):
+        response = json_stream(iter(range(5)), chunk_size=2)
+        eq_(list(response), ['[', '0,1', ',2,3', ',4', ']'])
+
+    def test_empty(self):
+        eq_(json_stream(iter([])).content, '[]')
@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from nose.tools import assert_raises, eq_
+import test_utils
+
+from commons import lazy
+from pto.holidays import HolidayCalendar, read_csv, read_ical, weekdays
+
+
+ICAL = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+SUMMARY:Independence Day
+DTSTART;VALUE=DATE:20110704
+DTEND;VALUE=DATE:20110705
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Thanksgiving
+DTSTART;VALUE=DATE:20111124
+DTEND;VALUE=DATE:20111126
+END:VEVENT
+END:VCALENDAR
+"""
+
+CSV = """date,name
+# Falls on a Saturday.
+2011-12-24,Christmas Eve
+2011-12-26,Christmas (observed)
+
+2011-07-04,Independence Day
+"""
+
+
+class HolidayFilesMixin(object):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.ics = self.write('holidays.ics', ICAL)
+        self.csv = self.write('holidays.csv', CSV)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+
+class HolidayTest(HolidayFilesMixin, test_utils.TestCase):
+
+    def test_read_ical(self):
+        eq_(list(read_ical(ICAL.splitlines())),
+            [date(2011, 7, 4), date(2011, 11, 24), date(2011, 11, 25)])
+
+    def test_read_csv(self):
+        eq_(list(read_csv(CSV.splitlines())),
+            [date(2011, 12, 24), date(2011, 12, 26), date(2011, 7, 4)])
+
+    def test_weekdays(self):
+        start = date(2011, 6, 1)
+        for n in range(30):
+            end = start + timedelta(days=n)
+            expected = len([start + timedelta(days=i) for i in range(n + 1)
+                            if (start + timedelta(days=i)).weekday() < 5])
+            eq_(weekdays(start, end), expected)
+        eq_(weekdays(start, start - timedelta(days=1)), 0)
+
+    def test_calendar(self):
+        calendar = HolidayCalendar([self.ics, self.csv])
+        # The 4th of July is in both files and Christmas Eve is a Saturday.
+        eq_(len(calendar), 4)
+        eq_(calendar.holidays(date(2011, 1, 1), date(2011, 12, 31)), 4)
+        # Thanksgiving week: Monday to Friday with two days off.
+        eq_(calendar.workdays(date(2011, 11, 21), date(2011, 11, 27)), 3)
+        eq_(calendar.workday_hours(date(2011, 7, 1), date(2011, 7, 5)),
+            Decimal('16'))
+
+    def test_bad_files(self):
+        assert_raises(ImproperlyConfigured, HolidayCalendar,
+                      [os.path.join(self.dir, 'holidays.txt')])
+        assert_raises(ImproperlyConfigured, HolidayCalendar,
+                      [os.path.join(self.dir, 'missing.csv')])
+        bad = self.write('bad.ics', ICAL.replace('20111126', '2011-11-26'))
+        with assert_raises(ImproperlyConfigured) as cm:
+            HolidayCalendar([bad])
+        assert 'bad.ics, line 11' in str(cm.exception)
+        bad = self.write('bad.csv', CSV.replace('2011-07-04', '2011-7-4'))
+        with assert_raises(ImproperlyConfigured) as cm:
+            HolidayCalendar([bad])
+        assert 'bad.csv, line 6' in str(cm.exception)
+
+    def test_csv_header(self):
+        # The header may come after comments, but only once.
+        eq_(list(read_csv([' # Indented.', 'date', '2011-07-04'])),
+            [date(2011, 7, 4)])
+        assert_raises(ImproperlyConfigured, list,
+                      read_csv(['date', 'name', '2011-07-04']))
+
+
+class HolidayCostingTest(HolidayFilesMixin, test_utils.TestCase):
+
+    def setUp(self):
+        super(HolidayCostingTest, self).setUp()
+        # A Wednesday off next year.
+        self.holiday = date(date.today().year + 1, 3, 1)
+        self.holiday += timedelta(days=(2 - self.holiday.weekday()) % 7)
+        self.old_files = settings.PTO_HOLIDAY_FILES
+        settings.PTO_HOLIDAY_FILES = [
+            self.ics, self.write('next.csv', self.holiday.isoformat())]
+        lazy.reset()
+
+    def tearDown(self):
+        settings.PTO_HOLIDAY_FILES = self.old_files
+        lazy.reset()
+        super(HolidayCostingTest, self).tearDown()
+
+    def test_calculate_pto(self):
+        monday = self.holiday - timedelta(days=2)
+        response = self.client.get(
+            '/en-US/calculate_pto.json',
+            dict(start_date=monday.isoformat(),
+                 end_date=(monday + timedelta(days=6)).isoformat(),
+                 per_quarter='0', hours_avail='40'))
+        eq_(response.status_code, 200)
+        data = json.loads(response.content)
+        eq_(data['trip_hours'], '32.0')
+        eq_(data['hours_available_on_start'], '40.0')
+        eq_(data['hours_available_after_trip'], '8.0')
+        eq_(data['days_available_after_trip'], '1.0')
+
+    def test_trip_plan_end_date(self):
+        response = self.client.post(
+            '/en-US/trip_plan.json',
+            '{"hours_avail": 40, "per_quarter": 0, "trips": '
+            '[{"start_date": "2011-11-21", "end_date": "2011-11-27"}]}',
+            content_type='application/json')
+        eq_(response.status_code, 200)
+        eq_(response.content,
+            '[{"id":null,"trips":[["2011-11-21","24.0",true,"40.0",'
+            '"16.0"]]}]')
+
+    def test_end_before_start(self):
+        response = self.client.get('/en-US/calculate_pto.json',
+                                   dict(start_date='2011-11-21',
+                                        end_date='2011-11-20',
+                                        per_quarter='0', hours_avail='40'))
+        eq_(response.status_code, 400)
@@ -0,0 +1,109 @@
+from datetime import date
+from decimal import Decimal
+import json
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from nose.tools import eq_
+import test_utils
+
+from pto import liability
+from pto.models import BalanceSnapshot, LiabilityRollup, Profile
+
+
+EXPORT = """username,hours_avail,per_quarter,policy,hire_date,team
+alice,8,5.19,,,web
+bob,16,4,semimonthly,2009-05-01,ops
+
+carol,lots,8,,,
+nobody,0,8,,,
+dave,0,8,nope,,
+"""
+
+
+class ImportProfilesTest(test_utils.TestCase):
+
+    def setUp(self):
+        for name in ('alice', 'bob', 'carol', 'dave'):
+            User.objects.create(username=name)
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_import(self, name, content, **options):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_profiles', path, as_of='2011-07-03',
+                     batch_size=2, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def profiles(self):
+        return sorted(Profile.objects.values_list(
+            'user__username', 'hours_avail', 'per_quarter', 'as_of',
+            'policy', 'hire_date', 'team'))
+
+    def test_import(self):
+        stdout, stderr = self.run_import('export.csv', EXPORT)
+        eq_(self.profiles(), [
+            (u'alice', Decimal('8'), Decimal('5.19'), date(2011, 7, 3), u'',
+             None, u'web'),
+            (u'bob', Decimal('16'), Decimal('4'), date(2011, 7, 3),
+             u'semimonthly', date(2009, 5, 1), u'ops')])
+        assert 'Line 5: hours_avail is not a number' in stderr
+        assert "Line 6: No user called 'nobody'" in stderr
+        assert 'Line 7: No accrual policy' in stderr
+        assert '2 created, 0 updated, 0 unchanged, 3 with errors' in stdout
+        # Imported profiles get their snapshots.
+        eq_(BalanceSnapshot.objects.filter(profile__user__username='alice',
+                                           date=date(2011, 7, 3))
+            .get().hours, Decimal('8'))
+
+    def test_only_changes(self):
+        self.run_import('export.csv', EXPORT)
+        modified = dict(Profile.objects.values_list('user__username',
+                                                    'modified'))
+        stdout, _ = self.run_import(
+            'export.csv', EXPORT.replace('16,4', '12,4'), mmap=True)
+        assert '0 created, 1 updated, 1 unchanged' in stdout
+        eq_(Profile.objects.get(user__username='alice').modified,
+            modified['alice'])
+        eq_(Profile.objects.get(user__username='bob').hours_avail,
+            Decimal('12'))
+
+    def test_team_change(self):
+        self.run_import('export.csv', EXPORT)
+        liability.refresh()
+        assert LiabilityRollup.objects.filter(team='web').exists()
+        self.run_import('export.csv', EXPORT.replace(',web', ',ops'))
+        liability.refresh()
+        # Alice no longer counts for her old team.
+        eq_(LiabilityRollup.objects.filter(team='web').count(), 0)
+        assert LiabilityRollup.objects.filter(team='ops').exists()
+
+    def test_not_utf8(self):
+        stdout, stderr = self.run_import(
+            'export.csv', 'username,hours_avail,per_quarter\n'
+                          'alice,8,4\nb\xffb,8,4\nbob,8,4\n')
+        assert 'Line 3: Not UTF-8' in stderr
+        assert '2 created, 0 updated, 0 unchanged, 1 with errors' in stdout
+
+    def test_jsonl(self):
+        rows = [dict(username='alice', hours_avail=8.5, per_quarter='4',
+                     as_of='2011-08-01'),
+                dict(username='bob', hours_avail=1, per_quarter=2,
+                     team=7)]
+        stdout, stderr = self.run_import(
+            'export.jsonl', '\n'.join(map(json.dumps, rows)) + '\nnot json\n')
+        eq_(self.profiles(), [
+            (u'alice', Decimal('8.5'), Decimal('4'), date(2011, 8, 1), u'',
+             None, u'')])
+        assert "Line 2: team is not text: '7'" in stderr
+        assert 'Line 3: Expected a JSON object' in stderr
@@ -0,0 +1,137 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from nose.tools import eq_
+import test_utils
+
+from pto import jobs
+from pto.accrual import count_accruals
+from pto.models import Profile
+
+
+class JobStoreTest(test_utils.TestCase):
+
+    def test_chunks(self):
+        job_id, created = jobs.create('test')
+        assert created
+        rows = [[n] for n in range(7)]
+        chunk_size = settings.PTO_JOB_CHUNK_SIZE
+        settings.PTO_JOB_CHUNK_SIZE = 3
+        try:
+            jobs.store(job_id, iter(rows), len(rows))
+        finally:
+            settings.PTO_JOB_CHUNK_SIZE = chunk_size
+        status = jobs.get_status(job_id)
+        eq_((status['status'], status['progress'], status['chunks']),
+            (jobs.DONE, 1.0, 3))
+        assert jobs.has_result(job_id, status)
+        eq_(list(jobs.result(job_id, status)), rows)
+
+    def test_failed(self):
+        def rows():
+            yield [1]
+            raise ValueError('no good')
+
+        job_id, _ = jobs.create('test')
+        try:
+            jobs.store(job_id, rows(), 2)
+        except ValueError:
+            pass
+        status = jobs.get_status(job_id)
+        eq_((status['status'], status['error']), (jobs.FAILED, 'no good'))
+
+    def test_same_params(self):
+        first, created = jobs.create('test', (1, 2))
+        eq_(jobs.create('test', (1, 2)), (first, False))
+        assert jobs.create('test', (1, 3))[0] != first
+        assert jobs.create('other', (1, 2))[0] != first
+        assert jobs.create('test')[0] != first
+
+    def test_failed_not_reused(self):
+        first, _ = jobs.create('test', (1, 2))
+        jobs.set_status(first, status=jobs.FAILED, error='no good')
+        job_id, created = jobs.create('test', (1, 2))
+        assert created and job_id != first
+        eq_(jobs.create('test', (1, 2)), (job_id, False))
+
+    def test_start_fails(self):
+        class Task(object):
+            def delay(self, *args):
+                raise IOError('no broker')
+
+        job_id, _ = jobs.create('test', (1, 2))
+        self.assertRaises(IOError, jobs.start, job_id, Task())
+        status = jobs.get_status(job_id)
+        eq_((status['status'], status['error']), (jobs.FAILED, 'no broker'))
+        assert jobs.create('test', (1, 2))[1]
+
+
+class JobViewTest(test_utils.TestCase):
+
+    def get(self, url, data=None):
+        return self.client.get('/en-US' + url, data or {})
+
+    def finish(self, response):
+        """Follows a started job through to its result rows."""
+        eq_(response.status_code, 202)
+        data = json.loads(response.content)
+        # Tests run tasks eagerly, so the job is already done.
+        status = json.loads(self.client.get(data['status_url']).content)
+        eq_((status['job'], status['status'], status['progress']),
+            (data['job'], jobs.DONE, 1.0))
+        response = self.client.get(status['result_url'])
+        eq_(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_timeline(self):
+        query = dict(end_date=(date.today() + timedelta(days=90)).isoformat(),
+                     per_quarter='8', hours_avail='2')
+        response = self.get('/jobs/balance_timeline.json', query)
+        job_id = json.loads(response.content)['job']
+        eq_(self.finish(response),
+            json.loads(self.get('/balance_timeline.json', query).content))
+        # The same parameters give the same job.
+        response = self.get('/jobs/balance_timeline.json', query)
+        eq_(json.loads(response.content)['job'], job_id)
+
+    def test_bad_input(self):
+        eq_(self.get('/jobs/balance_timeline.json').status_code, 400)
+
+    def test_unknown_job(self):
+        eq_(self.get('/jobs/%s.json' % ('0' * 32)).status_code, 404)
+        eq_(self.get('/jobs/%s/result.json' % ('0' * 32)).status_code, 404)
+
+    def test_not_done(self):
+        job_id, _ = jobs.create('test')
+        eq_(json.loads(self.get('/jobs/%s.json' % job_id).content)['status'],
+            jobs.PENDING)
+        eq_(self.get('/jobs/%s/result.json' % job_id).status_code, 409)
+
+    def test_report(self):
+        as_of = date.today().replace(day=3)
+        user = User.objects.create(username='traveler')
+        Profile.objects.create(user=user, hours_avail=Decimal('8'),
+                               per_quarter=Decimal('4'), as_of=as_of)
+        staff = User.objects.create(username='boss', is_staff=True)
+        staff.set_password('secret')
+        staff.save()
+        day = as_of + timedelta(days=45)
+        before = as_of - timedelta(days=1)
+        query = dict(date=[day.isoformat(), before.isoformat()])
+
+        eq_(self.get('/jobs/balance_report.json', query).status_code, 403)
+        self.client.login(username='boss', password='secret')
+        response = self.get('/jobs/balance_report.json', query)
+        hours = 8 + 4 * count_accruals(as_of, day)
+        eq_(self.finish(response),
+            [[user.id, [str(float(hours)), str(float(hours / 8.0))], None]])
+
+        # Only staff can see the result.
+        job = json.loads(response.content)['job']
+        self.client.logout()
+        eq_(self.get('/jobs/%s.json' % job).status_code, 403)
+        eq_(self.get('/jobs/%s/result.json' % job).status_code, 403)
@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+
+from django.contrib.auth.models import User
+from django.test.client import RequestFactory
+
+from nose.tools import eq_
+import test_utils
+
+from pto import liability
+from pto.accrual import count_accruals
+from pto.models import (LiabilityRollup, Profile, StaleLiability, Trip,
+                        to_decimal)
+from pto.views import liability_report
+
+
+class LiabilityTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.as_of = date.today().replace(day=3)
+        self.month = liability.month_start(self.as_of)
+        self.profiles = [self.profile(name, team, hours)
+                         for name, team, hours in [('a', 'web', '8'),
+                                                   ('b', 'web', '1.5'),
+                                                   ('c', 'ops', '0')]]
+
+    def profile(self, name, team, hours_avail):
+        return Profile.objects.create(
+            user=User.objects.create(username=name), team=team,
+            hours_avail=Decimal(hours_avail), per_quarter=Decimal('4'),
+            as_of=self.as_of)
+
+    def month_end(self, month):
+        return liability.next_month(month) - timedelta(days=1)
+
+    def expected(self, month, hours_avail, trips=0):
+        return (Decimal(hours_avail) - trips +
+                4 * count_accruals(self.as_of, self.month_end(month)))
+
+    def report(self):
+        liability.refresh()
+        return liability.report(self.month - timedelta(days=1),
+                                self.month_end(self.month))
+
+    def test_report(self):
+        eq_(self.report(), {
+            'web': {self.month: self.expected(self.month, '9.5') +
+                    self.expected(self.month, 0)},
+            'ops': {self.month: self.expected(self.month, 0)}})
+        eq_(StaleLiability.objects.count(), 0)
+        last = liability.last_month()
+        eq_(LiabilityRollup.objects.get(team='ops', month=last).hours,
+            self.expected(last, 0))
+
+    def test_incremental(self):
+        self.report()
+        later = liability.next_month(self.month)
+        ops = list(LiabilityRollup.objects.filter(team='ops')
+                   .values_list('id', flat=True))
+        earlier = list(LiabilityRollup.objects.filter(team='web',
+                                                      month__lt=later)
+                       .values_list('id', flat=True))
+        Trip.objects.create(profile=self.profiles[0], hours=6,
+                            start_date=later + timedelta(days=1))
+        eq_(list(StaleLiability.objects.values_list('team', 'since')),
+            [('web', later)])
+        eq_(liability.refresh(), 1)
+        eq_(LiabilityRollup.objects.get(team='web', month=later).hours,
+            self.expected(later, '9.5', 6) + self.expected(later, 0))
+        # Only the web team's months from the trip on were recomputed.
+        eq_(list(LiabilityRollup.objects.filter(team='ops')
+                 .values_list('id', flat=True)), ops)
+        eq_(list(LiabilityRollup.objects.filter(team='web', month__lt=later)
+                 .values_list('id', flat=True)), earlier)
+
+    def test_team_change(self):
+        self.report()
+        profile = Profile.objects.get(pk=self.profiles[0].pk)
+        profile.team = 'ops'
+        profile.save()
+        eq_(sorted(StaleLiability.objects.values_list('team', flat=True)),
+            ['ops', 'web'])
+        eq_(self.report(), {
+            'web': {self.month: self.expected(self.month, '1.5')},
+            'ops': {self.month: self.expected(self.month, '8') +
+                    self.expected(self.month, 0)}})
+
+    def test_deleted(self):
+        self.report()
+        self.profiles[2].delete()
+        eq_(self.report().keys(), ['web'])
+
+    def test_to_decimal(self):
+        eq_(to_decimal(1234567.123456), Decimal('1234567.123456'))
+        eq_(to_decimal(Decimal('1.5')), Decimal('1.500000'))
+
+    def test_stale_teams(self):
+        self.report()
+        eq_(liability.stale_teams(self.month), {})
+        later = liability.next_month(self.month)
+        Trip.objects.create(profile=self.profiles[0], hours=6,
+                            start_date=later + timedelta(days=1))
+        eq_(liability.stale_teams(self.month), {})
+        eq_(liability.stale_teams(later), {'web': later})
+        eq_(liability.stale_teams(later, ['ops']), {})
+
+    def test_mark(self):
+        StaleLiability.objects.mark('web', self.month)
+        StaleLiability.objects.mark('web', liability.next_month(self.month))
+        eq_(StaleLiability.objects.get(team='web').since, self.month)
+        earlier = self.month.replace(year=self.month.year - 1)
+        StaleLiability.objects.mark('web', earlier)
+        eq_(StaleLiability.objects.get(team='web').since, earlier)
+
+    def test_view(self):
+        query = dict(start_date=self.as_of.isoformat(),
+                     end_date=self.month_end(self.month).isoformat(),
+                     team='ops')
+        request = RequestFactory().get('/liability_report.json', query)
+        request.user = User.objects.create(username='finance',
+                                           is_staff=True)
+        # The new profiles' rollups aren't there yet.  Tests run tasks
+        # eagerly, so the refresh the report queues is done at once.
+        data = json.loads(liability_report(request).content)
+        eq_((data['teams'], data['stale']),
+            ({}, dict(ops=self.month.strftime('%Y-%m'))))
+        hours = self.expected(self.month, 0)
+        eq_(json.loads(liability_report(request).content),
+            dict(months=[self.month.strftime('%Y-%m')],
+                 teams=dict(ops=[[str(float(hours)),
+                                  str(float(hours / 8))]]),
+                 total=[[str(float(hours)), str(float(hours / 8))]],
+                 stale={}))
+        request.user = self.profiles[0].user
+        eq_(liability_report(request).status_code, 403)
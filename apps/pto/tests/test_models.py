@@ -0,0 +1,46 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from nose.tools import eq_
+import test_utils
+
+from pto.models import Profile, Trip
+
+
+class ProfileTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create(username='user%s' % i)
+                      for i in range(3)]
+
+    def profile(self, user, hours_avail='8'):
+        return Profile(user=user, hours_avail=Decimal(hours_avail),
+                       per_quarter=Decimal('5.19'), as_of=date(2011, 7, 1))
+
+    def test_with_trips(self):
+        Profile.objects.bulk_insert([self.profile(u)
+                                     for u in self.users[:2]])
+        first = Profile.objects.get(user=self.users[0])
+        Trip.objects.bulk_insert([
+            Trip(profile=first, start_date=date(2011, 9, day),
+                 hours=Decimal(day)) for day in (20, 5, 12)])
+        with self.assertNumQueries(1):
+            profiles = Profile.objects.with_trips([u.id for u in self.users])
+        eq_(sorted(profiles), [self.users[0].id, self.users[1].id])
+        profile = profiles[self.users[0].id]
+        eq_(profile.per_quarter, Decimal('5.19'))
+        eq_(profile.as_of, date(2011, 7, 1))
+        eq_([(t.start_date.day, t.hours) for t in profile.trip_list],
+            [(5, Decimal(5)), (12, Decimal(12)), (20, Decimal(20))])
+        eq_(profiles[self.users[1].id].trip_list, [])
+        eq_(Profile.objects.for_user(self.users[2].id), None)
+
+    def test_bulk_update(self):
+        Profile.objects.bulk_insert([self.profile(self.users[0])])
+        trip = Trip.objects.create(profile=Profile.objects.get(),
+                                   start_date=date(2011, 9, 1), hours=8)
+        trip.hours = Decimal('4.5')
+        Trip.objects.bulk_update([trip], ['hours'])
+        eq_(Trip.objects.get().hours, Decimal('4.5'))
@@ -0,0 +1,242 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from nose.tools import assert_raises, eq_
+import test_utils
+
+from commons import lazy
+from pto.accrual import (ACCRUAL_DAYS, accrual_calendar, accrual_date,
+                         accrual_index)
+from pto.policies import AccrualPolicy, get_policy
+from pto.views import result_cache
+
+
+# A plain semimonthly account, with no tiers, cap or carryover, worked out
+# directly.  The policy tests compare pto.policies.Account against it.
+# Amounts are fixed-point integers (or anything else that multiplies).
+
+def project_balance(hours_avail, per_quarter, start, end):
+    """Returns the balance on ``end`` after accruing from ``start``."""
+    return hours_avail + per_quarter * accrual_calendar.count(start, end)
+
+
+def earliest_date(hours_avail, per_quarter, target, start, end):
+    """Returns the first date from ``start`` to ``end`` with ``target``
+    hours, solved directly rather than by stepping through accruals."""
+    needed = target - hours_avail
+    if needed <= 0:
+        return start
+    if per_quarter <= 0:
+        return None
+    accruals = -(-needed // per_quarter)  # Rounded up.
+    index = accrual_index(start)
+    if start.day not in ACCRUAL_DAYS:
+        index += 1
+    index += accruals - 1
+    if index > accrual_index(end):
+        return None
+    return accrual_date(index)
+
+
+def plan_trips(hours_avail, per_quarter, start, trips):
+    """Yields ``(available, left)`` for each of ``trips``, ``(date,
+    hours)`` pairs in date order, as Account.plan_trips does."""
+    counts = accrual_calendar.count_many(start, [day for day, _ in trips])
+    taken = 0
+    for (day, hours), count in zip(trips, counts):
+        available = hours_avail + per_quarter * count - taken
+        taken += hours
+        yield available, available - hours
+
+
+def timeline(hours_avail, per_quarter, start, end, trips=()):
+    """Yields ``(date, balance)`` for every accrual date up to ``end``,
+    with every trip starting on or before it taken."""
+    trips = sorted(trips)
+    next_trip = 0
+    balance = hours_avail
+    for day in accrual_calendar.dates(start, end):
+        balance += per_quarter
+        while next_trip < len(trips) and trips[next_trip][0] <= day:
+            balance -= trips[next_trip][1]
+            next_trip += 1
+        yield day, balance
+
+
+class ReferenceTest(test_utils.TestCase):
+
+    def test_project_balance(self):
+        eq_(project_balance(Decimal('1'), Decimal('5.19'),
+                            date(2011, 7, 1), date(2011, 8, 1)),
+            Decimal('16.57'))
+
+    def test_timeline(self):
+        trips = [(date(2011, 7, 20), Decimal('16')),
+                 (date(2011, 7, 1), Decimal('8'))]
+        eq_(list(timeline(Decimal('10'), Decimal('5'), date(2011, 6, 20),
+                          date(2011, 8, 10), trips)),
+            [(date(2011, 7, 1), Decimal('7')),
+             (date(2011, 7, 15), Decimal('12')),
+             (date(2011, 8, 1), Decimal('1'))])
+
+    def test_earliest_date(self):
+        start = date(2011, 7, 2)
+        end = date(2012, 12, 31)
+        eq_(earliest_date(800, 519, 500, start, end), start)
+        eq_(earliest_date(0, 519, 519, start, end), date(2011, 7, 15))
+        eq_(earliest_date(0, 519, 520, start, end), date(2011, 8, 1))
+        eq_(earliest_date(0, 519, 519 * 36, start, end), None)
+        eq_(earliest_date(0, 0, 1, start, end), None)
+
+    def test_earliest_date_matches_projection(self):
+        start = date(2011, 7, 1)
+        end = date(2020, 1, 1)
+        for target in (1, 519, 1038, 1039, 20000):
+            day = earliest_date(0, 519, target, start, end)
+            assert project_balance(0, 519, start, day) >= target
+            assert project_balance(0, 519, start,
+                                   day - timedelta(days=1)) < target
+
+    def test_plan_trips(self):
+        trips = [(date(2011, 6, 1), 8), (date(2011, 7, 1), 16),
+                 (date(2011, 8, 1), 40)]
+        eq_(list(plan_trips(10, 5, date(2011, 6, 20), trips)),
+            [(10, 2), (7, -9), (1, -39)])
+
+
+class AccrualPolicyTest(test_utils.TestCase):
+
+    def account(self, hours_avail=0, per_quarter=10, hire_date=None,
+                **options):
+        policy = AccrualPolicy('test', **options)
+        return policy.account(hours_avail, per_quarter, 1, hire_date)
+
+    def test_semimonthly(self):
+        account = self.account(5, 8)
+        start = date(2011, 3, 4)
+        for days in (0, 11, 27, 300, 5000):
+            end = start + timedelta(days=days)
+            eq_(account.balance(start, end), project_balance(5, 8, start, end))
+
+    def test_semimonthly_matches_reference(self):
+        account = self.account(5, 8)
+        start = date(2011, 3, 4)
+        end = date(2013, 1, 1)
+        for target in (0, 5, 6, 100, 1000):
+            eq_(account.earliest_date(target, start, end),
+                earliest_date(5, 8, target, start, end))
+        trips = [(date(2011, 3, 10), 4), (date(2011, 6, 1), 30),
+                 (date(2012, 2, 15), 8)]
+        eq_(list(account.plan_trips(start, trips)),
+            list(plan_trips(5, 8, start, trips)))
+        eq_(list(account.timeline(start, end, trips)),
+            list(timeline(5, 8, start, end, trips)))
+
+    def test_biweekly(self):
+        account = self.account(schedule='biweekly', anchor='2011-01-07')
+        eq_(account.balance(date(2011, 1, 1), date(2011, 1, 31)), 20)
+        eq_(account.balance(date(2010, 12, 24), date(2011, 1, 6)), 10)
+        eq_([d.isoformat() for d, _ in
+             account.timeline(date(2011, 1, 1), date(2011, 2, 4))],
+            ['2011-01-07', '2011-01-21', '2011-02-04'])
+
+    def test_cap(self):
+        account = self.account(cap=25)
+        eq_(account.balance(date(2011, 1, 1), date(2011, 12, 31)), 25)
+        # Nothing accrues over the cap, but nothing is taken away either.
+        eq_(self.account(30, cap=25).balance(date(2011, 1, 1),
+                                             date(2011, 12, 31)), 30)
+
+    def test_carryover(self):
+        account = self.account(carryover=15)
+        # 20 by the end of December, cut to 15, then January 1st's 10.
+        eq_(account.balance(date(2011, 12, 1), date(2012, 1, 1)), 25)
+        eq_(account.balance(date(2011, 12, 1), date(2011, 12, 31)), 20)
+
+    def test_tiers(self):
+        account = self.account(hire_date=date(2009, 6, 10),
+                               tiers=[(2, 20), (5, 30)])
+        # June 1st is at the old rate, June 15th is after the anniversary.
+        eq_(account.balance(date(2011, 6, 1), date(2011, 6, 30)), 30)
+        eq_(account.balance(date(2014, 6, 1), date(2014, 6, 30)), 50)
+        # Without a hire date, per_quarter applies throughout.
+        eq_(self.account(tiers=[(2, 20)]).balance(date(2011, 6, 1),
+                                                  date(2011, 6, 30)), 20)
+
+    def test_timeline_matches_balance(self):
+        account = self.account(7, hire_date=date(2010, 3, 20), cap=120,
+                               carryover=40, tiers=[(1, 15)])
+        start = date(2010, 5, 6)
+        for day, balance in account.timeline(start, date(2013, 1, 1)):
+            eq_(balance, account.balance(start, day))
+
+    def test_balances(self):
+        account = self.account(cap=45)
+        start = date(2011, 1, 1)
+        ends = [date(2011, 3, 1), date(2010, 1, 1), date(2011, 1, 20),
+                date(2012, 1, 1)]
+        eq_(account.balances(start, ends),
+            [account.balance(start, end) for end in ends])
+
+    def test_earliest_date(self):
+        start = date(2011, 1, 2)
+        end = date(2020, 12, 31)
+        account = self.account(hire_date=date(2000, 1, 20),
+                               tiers=[(11, 20)])
+        # 10 on January 15th, then 20 a time from the anniversary.
+        eq_(account.earliest_date(50, start, end), date(2011, 2, 15))
+        eq_(account.earliest_date(0, start, end), start)
+        eq_(self.account(cap=40).earliest_date(50, start, end), None)
+        # 20 by the end of December, carried over, then 10 more.
+        eq_(self.account(carryover=15).earliest_date(
+            25, date(2011, 12, 1), end), date(2012, 1, 1))
+
+    def test_plan_trips(self):
+        account = self.account(cap=30)
+        trips = [(date(2011, 3, 1), 20), (date(2011, 6, 1), 10)]
+        eq_(list(account.plan_trips(date(2011, 1, 1), trips)),
+            [(30, 10), (30, 20)])
+
+    def test_bad_config(self):
+        assert_raises(ImproperlyConfigured, AccrualPolicy, 'x',
+                      schedule='monthly')
+        assert_raises(ImproperlyConfigured, AccrualPolicy, 'x',
+                      schedule='biweekly')
+        assert_raises(ImproperlyConfigured, AccrualPolicy, 'x',
+                      schedule='biweekly', anchor='soon')
+        assert_raises(ImproperlyConfigured, AccrualPolicy, 'x', cap='lots')
+
+
+class PolicyViewTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.old_policies = settings.PTO_ACCRUAL_POLICIES
+        settings.PTO_ACCRUAL_POLICIES = dict(self.old_policies,
+                                             capped=dict(cap='40'))
+        lazy.reset()
+        result_cache.clear()
+
+    def tearDown(self):
+        settings.PTO_ACCRUAL_POLICIES = self.old_policies
+        lazy.reset()
+
+    def get(self, **query):
+        query.update(per_quarter='8', hours_avail='0',
+                     start_date=(date.today() + timedelta(days=400))
+                     .isoformat())
+        return self.client.get('/en-US/calculate_pto.json', query)
+
+    def test_policy(self):
+        eq_(get_policy('capped').cap, 40)
+        response = self.get(policy='capped')
+        eq_(json.loads(response.content)['hours_available_on_start'],
+            '40.0')
+        data = json.loads(self.get().content)
+        assert float(data['hours_available_on_start']) > 40
+
+    def test_unknown_policy(self):
+        eq_(self.get(policy='nope').status_code, 400)
@@ -0,0 +1,63 @@
+import csv
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+
+from django.core.management import call_command
+
+from nose.tools import eq_
+import test_utils
+
+from pto.management.commands.project_balances import read_chunks
+
+
+EMPLOYEES = """id,hours_avail,per_quarter,policy
+1,0,8,
+2,16,5.19,semimonthly
+
+3,lots,8,
+4,0,8,nope
+5,40,0
+"""
+
+
+class ProjectBalancesTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.input = os.path.join(self.dir, 'employees.csv')
+        self.output = os.path.join(self.dir, 'balances.csv')
+        with open(self.input, 'w') as f:
+            f.write(EMPLOYEES)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def project(self, processes):
+        stderr = StringIO()
+        call_command('project_balances', self.input,
+                     dates='2012-01-01,2011-07-01', as_of='2011-06-20',
+                     output=self.output, processes=processes, chunk_size=2,
+                     stderr=stderr)
+        with open(self.output) as f:
+            return list(csv.reader(f)), stderr.getvalue()
+
+    def test_project(self):
+        rows, stderr = self.project(1)
+        # 13 accruals to New Year's Day, one to July 1st.
+        eq_(rows, [['id', '2012-01-01', '2011-07-01'],
+                   ['1', '104.0', '8.0'],
+                   ['2', '83.47', '21.19'],
+                   ['5', '40.0', '40.0']])
+        assert 'Line 5: hours_avail is not a number' in stderr
+        assert 'Line 6: No accrual policy' in stderr
+        assert '2 rows had errors' in stderr
+
+    def test_processes(self):
+        eq_(self.project(2)[0], self.project(1)[0])
+
+    def test_read_chunks(self):
+        rows = [['id'], ['1'], [], ['2'], ['3']]
+        eq_(list(read_chunks(rows, 2)),
+            [[(2, ['1']), (4, ['2'])], [(5, ['3'])]])
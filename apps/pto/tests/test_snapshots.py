@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from django.test.client import RequestFactory
+
+from nose.tools import eq_
+import test_utils
+
+from pto.accrual import count_accruals
+from pto.models import BalanceSnapshot, Profile, Trip
+from pto.snapshots import balance_on, snapshot_end
+from pto.views import stored_balance
+
+
+class SnapshotTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='traveler')
+        # Not an accrual date, so there is an extra snapshot for it.
+        self.as_of = date.today().replace(day=3)
+        self.profile = Profile.objects.create(
+            user=self.user, hours_avail=Decimal('8'),
+            per_quarter=Decimal('4.5'), as_of=self.as_of)
+
+    def snapshots(self):
+        return list(BalanceSnapshot.objects.filter(profile=self.profile)
+                    .order_by('date').values_list('date', 'hours'))
+
+    def expected(self, trips=()):
+        rows = []
+        for day, _ in self.snapshots():
+            taken = sum(hours for start, hours in trips
+                        if start <= day and day != self.as_of)
+            rows.append((day, 8 + Decimal('4.5') *
+                         count_accruals(self.as_of, day) - taken))
+        return rows
+
+    def test_built_on_save(self):
+        snapshots = self.snapshots()
+        eq_(snapshots[0], (self.as_of, Decimal('8')))
+        eq_(len(snapshots),
+            count_accruals(self.as_of, snapshot_end()) + 1)
+        eq_(snapshots, self.expected())
+
+    def test_trips(self):
+        trip_date = self.as_of + timedelta(days=100)
+        before = list(BalanceSnapshot.objects.filter(date__lt=trip_date)
+                      .order_by('id').values_list('id', flat=True))
+        trip = Trip.objects.create(profile=self.profile, hours=20,
+                                   start_date=trip_date)
+        eq_(self.snapshots(), self.expected([(trip_date, 20)]))
+        # Only snapshots from the trip on were rewritten.
+        eq_(list(BalanceSnapshot.objects.filter(date__lt=trip_date)
+                 .order_by('id').values_list('id', flat=True)), before)
+
+        trip.start_date += timedelta(days=60)
+        trip.save()
+        eq_(self.snapshots(), self.expected([(trip.start_date, 20)]))
+        trip.delete()
+        eq_(self.snapshots(), self.expected())
+
+    def test_balances_on(self):
+        other = Profile.objects.create(
+            user=User.objects.create(username='other'),
+            hours_avail=Decimal('1.25'), per_quarter=Decimal('0'),
+            as_of=self.as_of)
+        day = self.as_of + timedelta(days=45)
+        eq_(BalanceSnapshot.objects.balances_on(day),
+            {self.profile.id: 8 + Decimal('4.5') * count_accruals(self.as_of,
+                                                                  day),
+             other.id: Decimal('1.25')})
+        eq_(BalanceSnapshot.objects.balances_on(self.as_of - timedelta(1)),
+            {})
+
+    def test_balance_on(self):
+        day = self.as_of + timedelta(days=45)
+        hours = 8 + Decimal('4.5') * count_accruals(self.as_of, day)
+        eq_(balance_on(self.profile, day), hours)
+        # Past the snapshots, it is worked out.
+        later = snapshot_end() + timedelta(days=200)
+        eq_(balance_on(self.profile, later),
+            8 + Decimal('4.5') * count_accruals(self.as_of, later))
+        eq_(balance_on(self.profile, self.as_of - timedelta(1)), None)
+
+    def test_rebuild(self):
+        Trip.objects.create(profile=self.profile, hours=4,
+                            start_date=self.as_of + timedelta(days=20))
+        snapshots = self.snapshots()
+        BalanceSnapshot.objects.delete_for([self.profile.id])
+        eq_(self.snapshots(), [])
+        call_command('rebuild_snapshots')
+        eq_(self.snapshots(), snapshots)
+
+    def test_stored_balance(self):
+        day = self.as_of + timedelta(days=45)
+        request = RequestFactory().get('/stored_balance.json',
+                                       dict(date=day.isoformat()))
+        request.user = self.user
+        data = json.loads(stored_balance(request).content)
+        eq_(data['hours_available'],
+            str(float(8 + 4.5 * count_accruals(self.as_of, day))))
+        request.user = AnonymousUser()
+        eq_(stored_balance(request).status_code, 403)
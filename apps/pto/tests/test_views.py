@@ -0,0 +1,288 @@
+from datetime import date, timedelta
+import json
+
+from django.conf import settings
+from django.test.client import RequestFactory
+from django.utils import translation
+
+from nose.tools import eq_
+import test_utils
+
+from commons import lazy
+from commons.middleware import lean_paths
+from pto.accrual import count_accruals
+from pto.context_processors import global_settings
+from pto.views import result_cache
+
+
+class CalculatePTOTest(test_utils.TestCase):
+
+    def get_json(self, url, data):
+        response = self.client.get('/en-US' + url, data)
+        eq_(response.status_code, 200)
+        eq_(response['Content-Type'], 'application/json')
+        return json.loads(response.content)
+
+    def test_calculate_pto(self):
+        today = date.today()
+        start = today + timedelta(days=90)
+        accruals = count_accruals(today, start)
+        data = self.get_json('/calculate_pto.json',
+                             dict(start_date=start.isoformat(),
+                                  per_quarter='8', hours_avail='4'))
+        eq_(data['hours_available_on_start'],
+            str(float(4 + 8 * accruals)))
+        eq_(data['days_available_on_start'],
+            str(float(0.5 + accruals)))
+
+    def test_result_cache(self):
+        result_cache.clear()
+        query = dict(start_date=date.today().isoformat(), per_quarter='5.19',
+                     hours_avail='0')
+        hits = result_cache.hits
+        first = self.get_json('/calculate_pto.json', query)
+        query['per_quarter'] = '5.190'
+        eq_(self.get_json('/calculate_pto.json', query), first)
+        eq_(result_cache.hits, hits + 1)
+
+    def test_coalesce_through_cache(self):
+        query = dict(start_date=date.today().isoformat(), per_quarter='3',
+                     hours_avail='1')
+        result_cache.clear()
+        local = self.get_json('/calculate_pto.json', query)
+        result_cache.clear()
+        settings.PTO_COALESCE_BACKEND = 'cache'
+        try:
+            eq_(self.get_json('/calculate_pto.json', query), local)
+        finally:
+            settings.PTO_COALESCE_BACKEND = 'local'
+
+    def test_batch(self):
+        today = date.today()
+        starts = [today + timedelta(days=n) for n in (30, 365)]
+        data = self.get_json('/calculate_pto_batch.json',
+                             dict(start_date=[d.isoformat() for d in starts],
+                                  per_quarter=['8', '0'],
+                                  hours_avail=['0', '16']))
+        eq_(data['start_dates'], [d.isoformat() for d in starts])
+        eq_(len(data['balances']), 2)
+        for i, start in enumerate(starts):
+            hours = 8 * count_accruals(today, start)
+            eq_(data['balances'][0][i],
+                [str(float(hours)), str(float(hours / 8))])
+            eq_(data['balances'][1][i], ['16.0', '2.0'])
+
+    def test_batch_past_dates(self):
+        start = date.today() - timedelta(days=60)
+        data = self.get_json('/calculate_pto_batch.json',
+                             dict(start_date=start.isoformat(),
+                                  per_quarter='8', hours_avail='1'))
+        eq_(data['balances'], [[['1.0', '0.13']]])
+
+
+class BalanceTimelineTest(test_utils.TestCase):
+
+    def test_timeline(self):
+        today = date.today()
+        end = today + timedelta(days=60)
+        trip = today + timedelta(days=20)
+        response = self.client.get('/en-US/balance_timeline.json',
+                                   dict(end_date=end.isoformat(),
+                                        per_quarter='8', hours_avail='0',
+                                        trip='%s:4' % trip.isoformat()))
+        eq_(response.status_code, 200)
+        rows = json.loads(response.content)
+        eq_(len(rows), count_accruals(today, end))
+        for i, (day, hours, days) in enumerate(rows):
+            expected = 8 * (i + 1)
+            if day >= trip.isoformat():
+                expected -= 4
+            eq_(hours, str(float(expected)))
+
+
+class TargetDateTest(test_utils.TestCase):
+
+    def get_json(self, **query):
+        response = self.client.get('/en-US/target_date.json', query)
+        eq_(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_target_hours(self):
+        today = date.today()
+        data = self.get_json(hours_avail='0', per_quarter='8',
+                             target_hours='40')
+        day = date(*map(int, data['date'].split('-')))
+        eq_(count_accruals(today, day), 5)
+        eq_(data['hours_available_on_date'], '40.0')
+
+    def test_target_days(self):
+        data = self.get_json(hours_avail='0', per_quarter='8',
+                             target_days='5')
+        eq_(data['days_available_on_date'], '5.0')
+
+    def test_already_there(self):
+        data = self.get_json(hours_avail='50', per_quarter='8',
+                             target_hours='40')
+        eq_(data['date'], date.today().isoformat())
+
+    def test_never(self):
+        eq_(self.get_json(hours_avail='0', per_quarter='0',
+                          target_hours='40'), dict(date=None))
+
+
+class TripPlanTest(test_utils.TestCase):
+
+    def post(self, body):
+        return self.client.post('/en-US/trip_plan.json', json.dumps(body),
+                                content_type='application/json')
+
+    def test_plan(self):
+        today = date.today()
+        first = today + timedelta(days=100)
+        second = today + timedelta(days=40)
+        response = self.post(dict(id=7, hours_avail=8, per_quarter='0',
+                                  trips=[dict(start_date=first.isoformat(),
+                                              days=1),
+                                         dict(start_date=second.isoformat(),
+                                              days=0.5)]))
+        eq_(response.status_code, 200)
+        eq_(json.loads(response.content),
+            [dict(id=7, trips=[[second.isoformat(), '4.0', True, '8.0',
+                                '4.0'],
+                               [first.isoformat(), '8.0', False, '4.0',
+                                '-4.0']])])
+
+    def test_many_users(self):
+        users = [dict(id=i, hours_avail=i, per_quarter=8, trips=[])
+                 for i in range(250)]
+        response = self.post(dict(users=users))
+        eq_([r['id'] for r in json.loads(response.content)], range(250))
+
+    def test_bad_input(self):
+        eq_(self.post(dict(hours_avail=8, per_quarter=1,
+                           trips=[dict(start_date='soon', days=1)])
+                      ).status_code, 400)
+        eq_(self.post(dict(hours_avail=8)).status_code, 400)
+        eq_(self.client.get('/en-US/trip_plan.json').status_code, 400)
+
+
+class LeanViewTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.query = dict(start_date=date.today().isoformat(),
+                          per_quarter='8', hours_avail='0')
+
+    def test_skips_locale_redirect_and_middleware(self):
+        response = self.client.get('/calculate_pto.json', self.query)
+        eq_(response.status_code, 200)
+        assert 'X-Frame-Options' not in response
+
+    def test_full_stack_when_disabled(self):
+        settings.LEAN_VIEWS_ENABLED = False
+        try:
+            response = self.client.get('/calculate_pto.json', self.query)
+        finally:
+            settings.LEAN_VIEWS_ENABLED = True
+        eq_(response.status_code, 301)
+
+    def test_other_views_are_not_lean(self):
+        eq_(self.client.get('/').status_code, 301)
+
+    def test_resolved_once_per_path(self):
+        lean_paths.clear()
+        self.client.get('/calculate_pto.json', self.query)
+        eq_(lean_paths.get('/calculate_pto.json'), True)
+        self.client.get('/en-US/')
+        eq_(lean_paths.get('/'), False)
+
+    def test_default_locale(self):
+        translation.activate('fr')
+        try:
+            self.client.get('/calculate_pto.json', self.query)
+            eq_(translation.get_language(), settings.LANGUAGE_CODE)
+        finally:
+            translation.deactivate()
+
+
+class GuardTest(test_utils.TestCase):
+
+    def get(self, **query):
+        data = dict(start_date=date.today().isoformat(), per_quarter='8',
+                    hours_avail='0')
+        data.update(query)
+        return self.client.get('/en-US/calculate_pto.json', data)
+
+    def assert_bad_request(self, response):
+        eq_(response.status_code, 400)
+        assert json.loads(response.content)['error']
+
+    def test_bad_date(self):
+        self.assert_bad_request(self.get(start_date='next tuesdayish'))
+
+    def test_error_shows_bare_value(self):
+        eq_(json.loads(self.get(per_quarter=u'l\xf6ts').content)['error'],
+            u"per_quarter is not a number: 'l\xf6ts'")
+
+    def test_far_future(self):
+        self.assert_bad_request(self.get(start_date='9999-12-31'))
+
+    def test_bad_number(self):
+        self.assert_bad_request(self.get(per_quarter='lots'))
+        self.assert_bad_request(self.get(hours_avail='NaN'))
+        self.assert_bad_request(self.get(hours_avail='1e9'))
+        self.assert_bad_request(self.get(hours_avail='0.0000001'))
+
+    def test_missing(self):
+        self.assert_bad_request(
+            self.client.get('/en-US/calculate_pto.json'))
+
+    def test_unpaired_profiles(self):
+        self.assert_bad_request(self.client.get(
+            '/en-US/calculate_pto_batch.json',
+            dict(start_date=date.today().isoformat(), per_quarter=['1', '2'],
+                 hours_avail='0')))
+
+
+class RateLimitTest(test_utils.TestCase):
+
+    def setUp(self):
+        self.limit = settings.PTO_RATE_LIMIT, settings.PTO_RATE_BURST
+        settings.PTO_RATE_LIMIT, settings.PTO_RATE_BURST = 0.001, 2
+        lazy.reset()
+
+    def tearDown(self):
+        settings.PTO_RATE_LIMIT, settings.PTO_RATE_BURST = self.limit
+        lazy.reset()
+
+    def test_too_many_requests(self):
+        query = dict(start_date=date.today().isoformat(), per_quarter='8',
+                     hours_avail='0')
+        codes = [self.client.get('/en-US/calculate_pto.json',
+                                 query).status_code for i in range(3)]
+        eq_(codes, [200, 200, 429])
+
+    def test_forwarded_for(self):
+        key = settings.PTO_RATE_LIMIT_KEY
+        settings.PTO_RATE_LIMIT_KEY = 'pto.decorators.forwarded_for'
+        lazy.reset()
+        try:
+            query = dict(start_date=date.today().isoformat(),
+                         per_quarter='8', hours_avail='0')
+            codes = [self.client.get('/en-US/calculate_pto.json', query,
+                                     HTTP_X_FORWARDED_FOR='1.1.1.1, %s' % ip)
+                     .status_code for ip in ('10.0.0.1', '10.0.0.1',
+                                             '10.0.0.1', '10.0.0.2')]
+            eq_(codes, [200, 200, 429, 200])
+        finally:
+            settings.PTO_RATE_LIMIT_KEY = key
+
+
+class GlobalSettingsTest(test_utils.TestCase):
+
+    def test_copied_per_request(self):
+        request = RequestFactory().get('/')
+        context = global_settings(request)
+        eq_(context['LANGUAGE_CODE'], settings.LANGUAGE_CODE)
+        context['LANGUAGE_CODE'] = 'xx'
+        eq_(global_settings(request)['LANGUAGE_CODE'],
+            settings.LANGUAGE_CODE)
@@ -6,6 +6,23 @@ from django.views.i18n import javascript_catalog
 urlpatterns = patterns('pto.views',
     url(r'^$', 'home', name='pto.home'),
     url(r'^calculate_pto\.json$', 'calculate_pto', name='pto.calculate_pto'),
+    url(r'^calculate_pto_batch\.json$', 'calculate_pto_batch',
+        name='pto.calculate_pto_batch'),
+    url(r'^balance_timeline\.json$', 'balance_timeline',
+        name='pto.balance_timeline'),
+    url(r'^target_date\.json$', 'target_date', name='pto.target_date'),
+    url(r'^trip_plan\.json$', 'trip_plan', name='pto.trip_plan'),
+    url(r'^stored_balance\.json$', 'stored_balance',
+        name='pto.stored_balance'),
+    url(r'^liability_report\.json$', 'liability_report',
+        name='pto.liability_report'),
+    url(r'^jobs/balance_timeline\.json$', 'timeline_job',
+        name='pto.timeline_job'),
+    url(r'^jobs/balance_report\.json$', 'report_job', name='pto.report_job'),
+    url(r'^jobs/(?P<job_id>[0-9a-f]{32})\.json$', 'job_status',
+        name='pto.job_status'),
+    url(r'^jobs/(?P<job_id>[0-9a-f]{32})/result\.json$', 'job_result',
+        name='pto.job_result'),
 
     # Javascript translations.
     url('^jsi18n.js$', cache_page(60 * 60 * 24 * 365)(javascript_catalog),
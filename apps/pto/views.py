@@ -1,12 +1,34 @@
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
 from decimal import Decimal
+import functools
 import jingo
 
-from django.core.urlresolvers import reverse
+from django import http
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
 
-from dateutil.parser import parse as parse_datetime
+from commons.lazy import memoize
+from commons.lru import DailyLRUCache
+from commons.singleflight import CacheSingleFlight, SingleFlight
+from commons.urlresolvers import reverse
 
-from .decorators import json_view
+from . import jobs, liability
+from .accrual import HOURS_PER_DAY, hours_scale, round_fixed, to_fixed
+from .decorators import dumps, json_error, json_view, lean, rate_limited
+from .holidays import holiday_calendar
+from .inputs import (BadRequest, get_date, get_dates, get_field, get_hours,
+                     get_hours_list, get_json_body, get_list, read_policy,
+                     to_date, to_hours)
+from .models import Profile
+from .snapshots import balance_on, snapshot_end
+
+
+# calculate_pto response bodies, keyed on the normalized inputs and
+# today's date.
+result_cache = DailyLRUCache(settings.PTO_RESULT_CACHE_SIZE)
+
+# Concurrent calculate_pto misses for the same key wait for one another.
+calculations = SingleFlight()
 
 
 def home(request):
@@ -14,40 +36,410 @@ def home(request):
                         dict(calculate_pto_url=reverse('pto.calculate_pto')))
 
 
-def days_to_hrs(day):
-    return day * Decimal('8')
+@lean
+@rate_limited
+@json_view
+def calculate_pto(request):
+    """Projects the balance on ``start_date``.
+
+    With an ``end_date`` too, the trip's cost in workday hours (weekends
+    and company holidays are free) and the balance left after it are
+    included.  See :func:`~pto.inputs.read_policy` for ``policy`` and
+    ``hire_date``.
+    """
+    today = date.today()
+    policy, hire_date = read_policy(request.GET)
+    trip_start = get_date(request, 'start_date')
+    trip_end = None
+    if 'end_date' in request.GET:
+        trip_end = get_date(request, 'end_date')
+        if trip_end < trip_start:
+            raise BadRequest('end_date is before start_date')
+    hours_per_quarter = get_hours(request, 'per_quarter')
+    hours_avail = get_hours(request, 'hours_avail')
+    key = (today, policy.name, hire_date, trip_start, trip_end,
+           hours_per_quarter, hours_avail)
+    body = result_cache.get(key)
+    if body is None:
+        body = coalesce(key, lambda: dumps(project_trip(
+            today, policy, hire_date, trip_start, trip_end,
+            hours_per_quarter, hours_avail)))
+        result_cache.set(key, body)
+    return http.HttpResponse(body, content_type='application/json')
+
+
+def project_trip(today, policy, hire_date, trip_start, trip_end,
+                 hours_per_quarter, hours_avail):
+    """Returns the :func:`calculate_pto` result."""
+    scale = hours_scale(hours_per_quarter, hours_avail, *policy.amounts)
+    account = policy.account(to_fixed(hours_avail, scale),
+                             to_fixed(hours_per_quarter, scale), scale,
+                             hire_date)
+    balance = account.balance(today, trip_start)
+    hours, days = format_balance(balance, scale)
+    result = dict(hours_available_on_start=hours,
+                  days_available_on_start=days)
+    if trip_end is not None:
+        cost = to_fixed(holiday_calendar().workday_hours(trip_start,
+                                                         trip_end), scale)
+        hours, days = format_balance(balance - cost, scale)
+        result.update(trip_hours=format_balance(cost, scale)[0],
+                      hours_available_after_trip=hours,
+                      days_available_after_trip=days)
+    return result
 
 
-def hrs_to_days(hour):
-    return hour / Decimal('8')
+def coalesce(key, func):
+    """Returns ``func()``, sharing one call among concurrent callers with
+    the same ``key``: the threads of this process, and with the ``cache``
+    ``PTO_COALESCE_BACKEND`` every process."""
+    if settings.PTO_COALESCE_BACKEND == 'cache':
+        func = functools.partial(shared_calculations().do, key, func)
+    return calculations.do(key, func)
 
 
+@memoize
+def shared_calculations():
+    return CacheSingleFlight(timeout=settings.PTO_COALESCE_TIMEOUT,
+                             result_timeout=settings.PTO_COALESCE_TIMEOUT,
+                             prefix='pto:calculate')
+
+
+@lean
+@rate_limited
 @json_view
-def calculate_pto(request):
-    d = date.today()
-    today = datetime(d.year, d.month, d.day, 0, 0, 0)
-    trip_start = parse_datetime(request.GET['start_date'])
-    pointer = today
-    hours_per_quarter = Decimal(request.GET['per_quarter'])
-    hours_avail = Decimal(request.GET['hours_avail'])
-    while pointer <= trip_start:
-        if pointer.day == 1 or pointer.day == 15:
-            hours_avail += hours_per_quarter
-        if pointer.day > 15:
-            add_days = days_til_1st(pointer)
+def calculate_pto_batch(request):
+    """Projects balances for many start dates and profiles at once.
+
+    ``start_date`` may be repeated, as may ``hours_avail`` and
+    ``per_quarter`` (paired up in order, one pair per profile), all under
+    the same ``policy``.  Each profile's balances are worked out in one
+    pass over the start dates.  Balances come back as ``[hours, days]``
+    pairs, one row per profile and one column per start date.
+    """
+    today = date.today()
+    policy, hire_date = read_policy(request.GET)
+    trip_starts = get_dates(request, 'start_date')
+    hours_avails = get_hours_list(request, 'hours_avail')
+    per_quarters = get_hours_list(request, 'per_quarter')
+    if len(hours_avails) != len(per_quarters):
+        raise BadRequest('hours_avail and per_quarter must be paired')
+    scale = hours_scale(*(hours_avails + per_quarters + policy.amounts))
+    balances = []
+    for hours_avail, per_quarter in zip(hours_avails, per_quarters):
+        account = policy.account(to_fixed(hours_avail, scale),
+                                 to_fixed(per_quarter, scale), scale,
+                                 hire_date)
+        balances.append([format_balance(balance, scale) for balance
+                         in account.balances(today, trip_starts)])
+    return dict(start_dates=[d.isoformat() for d in trip_starts],
+                balances=balances)
+
+
+@lean
+@rate_limited
+@json_view
+def balance_timeline(request):
+    """Streams the balance on every accrual date up to ``end_date``.
+
+    ``trip`` may be repeated as ``YYYY-MM-DD:hours`` to deduct planned
+    trips.  Each row is ``[date, hours, days]``.
+    """
+    return timeline_rows(date.today(), *read_timeline(request))
+
+
+def read_timeline(request):
+    """Returns the checked :func:`balance_timeline` parameters as
+    ``(policy, hire_date, hours_avail, per_quarter, end, trips)``."""
+    policy, hire_date = read_policy(request.GET)
+    end = get_date(request, 'end_date')
+    hours_per_quarter = get_hours(request, 'per_quarter')
+    hours_avail = get_hours(request, 'hours_avail')
+    trips = []
+    for trip in get_list(request, 'trip'):
+        trip_start, _, hours = trip.rpartition(':')
+        trips.append((to_date(trip_start, 'trip'), to_hours(hours, 'trip')))
+    return policy, hire_date, hours_avail, hours_per_quarter, end, trips
+
+
+def timeline_rows(today, policy, hire_date, hours_avail, hours_per_quarter,
+                  end, trips):
+    """Yields the ``[date, hours, days]`` rows of a balance timeline."""
+    scale = hours_scale(hours_per_quarter, hours_avail,
+                        *([hours for _, hours in trips] + policy.amounts))
+    trips = [(day, to_fixed(hours, scale)) for day, hours in trips]
+    account = policy.account(to_fixed(hours_avail, scale),
+                             to_fixed(hours_per_quarter, scale), scale,
+                             hire_date)
+    balances = account.timeline(today, end, trips)
+    return ([day] + list(format_balance(balance, scale))
+            for day, balance in balances)
+
+
+@lean
+@rate_limited
+@json_view
+def target_date(request):
+    """Finds the earliest date a target balance is reached.
+
+    Give ``target_hours`` or ``target_days``.  ``date`` is today if the
+    balance is already there, the accrual date that gets it there, or null
+    if that is more than ``PTO_MAX_HORIZON_YEARS`` away.
+    """
+    today = date.today()
+    policy, hire_date = read_policy(request.GET)
+    hours_per_quarter = get_hours(request, 'per_quarter')
+    hours_avail = get_hours(request, 'hours_avail')
+    if 'target_days' in request.GET:
+        target = get_hours(request, 'target_days') * HOURS_PER_DAY
+    else:
+        target = get_hours(request, 'target_hours')
+    scale = hours_scale(hours_per_quarter, hours_avail, target,
+                        *policy.amounts)
+    account = policy.account(to_fixed(hours_avail, scale),
+                             to_fixed(hours_per_quarter, scale), scale,
+                             hire_date)
+    end = date(min(today.year + settings.PTO_MAX_HORIZON_YEARS,
+                   date.max.year), 12, 31)
+    day = account.earliest_date(to_fixed(target, scale), today, end)
+    if day is None:
+        return dict(date=None)
+    hours, days = format_balance(account.balance(today, day), scale)
+    return dict(date=day, hours_available_on_date=hours,
+                days_available_on_date=days)
+
+
+@lean
+@csrf_exempt
+@rate_limited
+@json_view
+def trip_plan(request):
+    """Checks whether planned trips are covered, for one or many people.
+
+    POST a JSON object with ``hours_avail``, ``per_quarter`` and ``trips``,
+    a list of ``{"start_date": ..., "days": ...}`` where days are workdays,
+    or of ``{"start_date": ..., "end_date": ...}`` to cost the workdays in
+    that range (weekends and company holidays are free).  ``policy`` and
+    ``hire_date`` are optional, as for :func:`~pto.inputs.read_policy`.
+    Or POST ``{"users": [...]}`` with an ``id`` and those fields for each
+    person.  One result per person is streamed back::
+
+        {"id": ..., "trips": [[start_date, hours, covered,
+                               hours_available, hours_left], ...]}
+
+    with the trips in date order.  Nothing is stored, so this needs no
+    CSRF token.
+    """
+    body = get_json_body(request)
+    if 'users' in body:
+        users = get_field(body, 'users', settings.PTO_MAX_PLAN_USERS)
+    else:
+        users = [body]
+    # Check everything before streaming starts so bad input is still a 400.
+    plans = [read_plan(user) for user in users]
+    today = date.today()
+    return (dict(id=user_id, trips=check_trips(today, *plan))
+            for user_id, plan in plans)
+
+
+@rate_limited
+@json_view
+def stored_balance(request):
+    """The signed-in user's stored balance on ``date`` (default today).
+
+    Read from their balance snapshots when those cover the date.
+    """
+    if not request.user.is_authenticated():
+        return json_error('Sign in to see your stored balance', 403)
+    day = date.today()
+    if 'date' in request.GET:
+        day = get_date(request, 'date')
+    profile = Profile.objects.for_user(request.user.id)
+    if profile is None:
+        return json_error('No stored PTO profile', 404)
+    hours = balance_on(profile, day, profile.trip_list)
+    if hours is None:
+        raise BadRequest('date is before the profile was last updated')
+    hours, days = format_hours(hours)
+    return dict(date=day, as_of=profile.as_of, hours_available=hours,
+                days_available=days)
+
+
+@rate_limited
+@json_view
+def liability_report(request):
+    """Accrued but unused hours by team, at the end of each month from
+    ``start_date``'s (default this month) to ``end_date``'s (default a
+    year on).  Staff only.
+
+    ``team`` may be repeated to report on just those teams.  Each team's
+    row, and the ``total`` row, has a ``[hours, days]`` pair per month.
+
+    The totals are read from rollups.  ``stale`` maps teams whose rollups
+    are out of date to the first month that is; a background refresh is
+    queued for them.
+    """
+    if not request.user.is_staff:
+        return json_error('Only staff can see the liability report', 403)
+    start = liability.month_start(date.today())
+    if 'start_date' in request.GET:
+        start = liability.month_start(get_date(request, 'start_date'))
+    end = min(start.replace(year=start.year + 1) - timedelta(days=1),
+              snapshot_end())
+    if 'end_date' in request.GET:
+        end = get_date(request, 'end_date')
+    if end < start:
+        raise BadRequest('end_date is before start_date')
+    if liability.month_start(end) > liability.last_month():
+        raise BadRequest('end_date is past the last stored balances, %s'
+                         % snapshot_end())
+    teams = get_list(request, 'team') or None
+    totals = liability.report(start, end, teams)
+    stale = liability.stale_teams(end, teams)
+    if stale:
+        # pto.tasks imports this module.
+        from . import tasks
+        tasks.queue_liability_refresh()
+    months = list(liability.months(start, end))
+    zero = Decimal(0)
+    rows = dict((team, [format_hours(hours.get(month, zero))
+                        for month in months])
+                for team, hours in totals.items())
+    total = [format_hours(sum(hours.get(month, zero)
+                              for hours in totals.values()))
+             for month in months]
+    return dict(months=[m.strftime('%Y-%m') for m in months], teams=rows,
+                total=total, stale=dict((team, since.strftime('%Y-%m'))
+                                        for team, since in stale.items()))
+
+
+@lean
+@rate_limited
+@json_view
+def timeline_job(request):
+    """Starts :func:`balance_timeline` as a background job.
+
+    Takes the same parameters and answers 202 with the job's id and the
+    URL to poll; see :func:`job_status`.  Asking again with the same
+    parameters while the job's result is kept gives the same job.
+    """
+    from . import tasks
+    params = read_timeline(request)
+    policy, args = params[0], params[1:]
+    job_id, created = jobs.create('timeline',
+                                  (date.today(), policy.name) + args)
+    if created:
+        jobs.start(job_id, tasks.balance_timeline, policy.name, *args)
+    return job_started(job_id)
+
+
+@rate_limited
+@json_view
+def report_job(request):
+    """Starts a report of every stored profile's balance on each
+    ``date``, for staff only.  See :func:`pto.tasks.balance_report`."""
+    from . import tasks
+    if not request.user.is_staff:
+        return json_error('Only staff can run reports', 403)
+    dates = get_dates(request, 'date')
+    job_id, created = jobs.create('report', (date.today(), tuple(dates)),
+                                  staff_only=True)
+    if created:
+        jobs.start(job_id, tasks.balance_report, dates)
+    return job_started(job_id)
+
+
+def job_started(job_id):
+    response = http.HttpResponse(
+        dumps(dict(job=job_id,
+                   status_url=reverse('pto.job_status', args=[job_id]))),
+        content_type='application/json')
+    response.status_code = 202
+    return response
+
+
+@rate_limited
+@json_view
+def job_status(request, job_id):
+    """A background job's status and progress, from 0 to 1.
+
+    Once the status is ``done``, ``result_url`` streams the result rows.
+    """
+    status = jobs.get_status(job_id)
+    if status is None:
+        return json_error('No such job, or it has expired', 404)
+    if status['staff_only'] and not request.user.is_staff:
+        return json_error('Only staff can see this job', 403)
+    response = dict(job=job_id, status=status['status'],
+                    progress=status['progress'])
+    if 'error' in status:
+        response['error'] = status['error']
+    if status['status'] == jobs.DONE:
+        response['result_url'] = reverse('pto.job_result', args=[job_id])
+    return response
+
+
+@rate_limited
+@json_view
+def job_result(request, job_id):
+    """Streams a finished job's result rows as a JSON array."""
+    status = jobs.get_status(job_id)
+    if status is None or (status['status'] == jobs.DONE and
+                          not jobs.has_result(job_id, status)):
+        return json_error('No such job, or it has expired', 404)
+    if status['staff_only'] and not request.user.is_staff:
+        return json_error('Only staff can see this job', 403)
+    if status['status'] != jobs.DONE:
+        return json_error('The job is %s' % status['status'], 409)
+    return jobs.result(job_id, status)
+
+
+def read_plan(user):
+    """Returns ``(id, (policy, hire_date, hours_avail, per_quarter, trips))``
+    from JSON."""
+    if not isinstance(user, dict):
+        raise BadRequest('Each user must be an object')
+    policy, hire_date = read_policy(user)
+    trips = []
+    for trip in get_field(user, 'trips', settings.PTO_MAX_ITEMS):
+        start = to_date(get_field(trip, 'start_date'), 'start_date')
+        if 'end_date' in trip:
+            end = to_date(trip['end_date'], 'end_date')
+            if end < start:
+                raise BadRequest('end_date is before start_date')
+            hours = holiday_calendar().workday_hours(start, end)
         else:
-            add_days = 15 - pointer.day
-        if add_days == 0:
-            add_days = 15  # 1st of the month
-        pointer += timedelta(days=add_days)
-    return dict(hours_available_on_start=str(round(hours_avail, 2)),
-                days_available_on_start=str(round(hrs_to_days(hours_avail),
-                                                  2)))
-
-
-def days_til_1st(a_datetime):
-    """Returns the number of days until the 1st of the next month."""
-    next = a_datetime.replace(day=28)
-    while next.month == a_datetime.month:
-        next = next + timedelta(days=1)
-    return (next - a_datetime).days
+            hours = to_hours(get_field(trip, 'days'), 'days') * HOURS_PER_DAY
+        trips.append((start, hours))
+    trips.sort(key=lambda trip: trip[0])
+    return user.get('id'), (
+        policy, hire_date,
+        to_hours(get_field(user, 'hours_avail'), 'hours_avail'),
+        to_hours(get_field(user, 'per_quarter'), 'per_quarter'), trips)
+
+
+def check_trips(today, policy, hire_date, hours_avail, per_quarter, trips):
+    scale = hours_scale(hours_avail, per_quarter,
+                        *([hours for _, hours in trips] + policy.amounts))
+    fixed_trips = [(day, to_fixed(hours, scale)) for day, hours in trips]
+    account = policy.account(to_fixed(hours_avail, scale),
+                             to_fixed(per_quarter, scale), scale, hire_date)
+    results = account.plan_trips(today, fixed_trips)
+    return [[day, round_fixed(cost, scale), available >= cost,
+             round_fixed(available, scale), round_fixed(left, scale)]
+            for (day, cost), (available, left) in zip(fixed_trips, results)]
+
+
+def format_balance(amount, scale):
+    """Returns ``(hours, days)`` rounded for the JSON responses.
+
+    ``amount`` is in ``1/scale`` hours; see ``pto.accrual.round_fixed``.
+    """
+    return (round_fixed(amount, scale),
+            round_fixed(amount, scale, HOURS_PER_DAY))
+
+
+def format_hours(hours):
+    """Like :func:`format_balance`, for a Decimal number of hours."""
+    scale = hours_scale(hours.normalize())
+    return format_balance(to_fixed(hours, scale), scale)
@@ -0,0 +1,25 @@
+CREATE TABLE `pto_profiles` (
+    `id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY,
+    `user_id` integer NOT NULL UNIQUE,
+    `hours_avail` numeric(12, 6) NOT NULL,
+    `per_quarter` numeric(12, 6) NOT NULL,
+    `as_of` date NOT NULL,
+    `policy` varchar(64) NOT NULL,
+    `hire_date` date,
+    `modified` datetime NOT NULL,
+    CONSTRAINT `pto_profiles_user_id_fk` FOREIGN KEY (`user_id`)
+        REFERENCES `auth_user` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+CREATE TABLE `pto_trips` (
+    `id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY,
+    `profile_id` integer NOT NULL,
+    `start_date` date NOT NULL,
+    `end_date` date,
+    `hours` numeric(12, 6) NOT NULL,
+    CONSTRAINT `pto_trips_profile_id_fk` FOREIGN KEY (`profile_id`)
+        REFERENCES `pto_profiles` (`id`) ON DELETE CASCADE,
+    -- A user's trips in date order, and every trip on a date.
+    KEY `pto_trips_profile_id_start_date` (`profile_id`, `start_date`),
+    KEY `pto_trips_start_date` (`start_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
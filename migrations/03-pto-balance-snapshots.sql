@@ -0,0 +1,12 @@
+CREATE TABLE `pto_balance_snapshots` (
+    `id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY,
+    `profile_id` integer NOT NULL,
+    `date` date NOT NULL,
+    `hours` numeric(16, 6) NOT NULL,
+    CONSTRAINT `pto_balance_snapshots_profile_id_fk` FOREIGN KEY (`profile_id`)
+        REFERENCES `pto_profiles` (`id`) ON DELETE CASCADE,
+    -- A profile's snapshots in date order; also serves the group-wise max
+    -- in balances_on().
+    UNIQUE KEY `pto_balance_snapshots_profile_id_date` (`profile_id`, `date`),
+    KEY `pto_balance_snapshots_date` (`date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
@@ -0,0 +1,18 @@
+ALTER TABLE `pto_profiles`
+    ADD COLUMN `team` varchar(64) NOT NULL DEFAULT '' AFTER `hire_date`,
+    ADD KEY `pto_profiles_team` (`team`);
+
+CREATE TABLE `pto_liability_rollups` (
+    `id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY,
+    `month` date NOT NULL,
+    `team` varchar(64) NOT NULL,
+    `hours` numeric(20, 6) NOT NULL,
+    -- Reports read a range of months.
+    UNIQUE KEY `pto_liability_rollups_month_team` (`month`, `team`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+
+CREATE TABLE `pto_liability_stale` (
+    `id` integer AUTO_INCREMENT NOT NULL PRIMARY KEY,
+    `team` varchar(64) NOT NULL UNIQUE,
+    `since` date NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
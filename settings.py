@@ -4,7 +4,7 @@ import logging
 import os
 import socket
 
-from django.utils.functional import lazy
+from commons.lazy import lazy_once
 
 # Make file paths relative to settings.
 ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -97,7 +97,9 @@ def lazy_lang_url_map():
     langs = settings.DEV_LANGUAGES if settings.DEV else settings.PROD_LANGUAGES
     return dict([(i.lower(), i) for i in langs])
 
-LANGUAGE_URL_MAP = lazy(lazy_lang_url_map, dict)()
+# Evaluated once; call commons.lazy.reset() after changing DEV or the
+# language lists at runtime.
+LANGUAGE_URL_MAP = lazy_once(lazy_lang_url_map, dict)
 
 # Override Django's built-in with our native names
 def lazy_langs():
@@ -110,7 +112,10 @@ def lazy_langs():
 # Where to store product details etc.
 PROD_DETAILS_DIR = path('lib/product_details_json')
 
-LANGUAGES = lazy(lazy_langs, dict)()
+LANGUAGES = lazy_once(lazy_langs, dict)
+
+# How many distinct Accept-Language headers to remember the best locale for.
+ACCEPT_LANGUAGE_CACHE_SIZE = 256
 
 # Paths that don't require a locale code in the URL.
 SUPPORTED_NONLOCALES = ['media']
@@ -159,6 +164,11 @@ TEMPLATE_DIRS = (
     path('templates'),
 )
 
+# Where Jinja keeps compiled templates so workers don't recompile them after
+# a restart. Run ./manage.py compile_templates when deploying to fill it.
+# Set to None to turn the bytecode cache off.
+JINJA_BYTECODE_CACHE_DIR = path('tmp', 'jinja')
+
 def JINJA_CONFIG():
     import jinja2
     from django.conf import settings
@@ -166,6 +176,14 @@ def JINJA_CONFIG():
     config = {'extensions': ['tower.template.i18n', 'jinja2.ext.do',
                              'jinja2.ext.with_', 'jinja2.ext.loopcontrols'],
               'finalize': lambda x: x if x is not None else ''}
+    if settings.JINJA_BYTECODE_CACHE_DIR:
+        cache_dir = settings.JINJA_BYTECODE_CACHE_DIR
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # Already there, possibly made by another worker.
+            pass
+        config['bytecode_cache'] = jinja2.FileSystemBytecodeCache(cache_dir)
 #    if 'memcached' in cache.scheme and not settings.DEBUG:
         # We're passing the _cache object directly to jinja because
         # Django can't store binary directly; it enforces unicode on it.
@@ -210,17 +228,25 @@ MINIFY_BUNDLES = {
 
 ## Middlewares, apps, URL configs.
 
+# The commons versions of the session, CSRF, auth, messages and frame options
+# middleware wrap the originals and skip views marked with
+# pto.decorators.lean. See commons.middleware.skip_for_lean.
 MIDDLEWARE_CLASSES = (
     'commons.middleware.LocaleURLMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'commons.middleware.SessionMiddleware',
+    'commons.middleware.CsrfViewMiddleware',
+    'commons.middleware.AuthenticationMiddleware',
+    'commons.middleware.MessageMiddleware',
 
-    'commonware.middleware.FrameOptionsHeader',
+    'commons.middleware.FrameOptionsHeader',
 )
 
+# Set to False to run every middleware for lean views too.
+LEAN_VIEWS_ENABLED = True
+# How many URL paths to remember whether they are for a lean view.
+LEAN_PATH_CACHE_SIZE = 1024
+
 ROOT_URLCONF = '%s.urls' % ROOT_PACKAGE
 
 INSTALLED_APPS = (
@@ -291,8 +317,86 @@ HMAC_KEYS = {  # for bcrypt only
     #'2011-01-01': 'cheesecake',
 }
 
+## PTO
+
+# How many years past today the precomputed accrual calendar covers. Dates
+# beyond that still work; the calendar grows to fit them.
+PTO_ACCRUAL_CALENDAR_YEARS = 30
+
+# Accrual policies by name; see pto.policies for the options. Requests pick
+# one with ?policy=name. For example:
+#   'biweekly-tiered': {'schedule': 'biweekly', 'anchor': '2011-01-07',
+#                       'tiers': [(3, '5.54'), (5, '6.77')],
+#                       'cap': '240', 'carryover': '80'},
+PTO_ACCRUAL_POLICIES = {
+    'semimonthly': {},
+}
+PTO_DEFAULT_POLICY = 'semimonthly'
+
+# Company holidays, as .ics or .csv files; see pto.holidays. Trips costed by
+# date range don't charge for these or for weekends.
+PTO_HOLIDAY_FILES = ()
+
+# PTO math is done on integers counting 1/PTO_HOURS_SCALE of an hour. Inputs
+# with more decimal places than this get a finer scale automatically.
+PTO_HOURS_SCALE = 100
+
+# How many calculate_pto results to keep in each process. The cache is
+# emptied at midnight since results depend on today's date.
+PTO_RESULT_CACHE_SIZE = 1024
+
+# Stored profiles have balance snapshots up to the end of the year this many
+# years ahead; see pto.snapshots.
+PTO_SNAPSHOT_YEARS = 2
+
+# Background PTO jobs (see pto.jobs) keep their status and results in the
+# cache for this many seconds, stored this many rows to a cache key.
+PTO_JOB_TTL = 60 * 60
+PTO_JOB_CHUNK_SIZE = 1000
+
+# How many parsed date strings to remember.
+PTO_DATE_CACHE_SIZE = 1024
+
+# Bounds on what the PTO API accepts. Anything outside them gets a 400.
+PTO_MAX_HORIZON_YEARS = 100
+PTO_MAX_HOURS = 100000
+PTO_MAX_DECIMAL_PLACES = 6
+# Most values one parameter may have, e.g. start dates in a batch.
+PTO_MAX_ITEMS = 500
+# Most people one trip_plan request may cover.
+PTO_MAX_PLAN_USERS = 10000
+
+# Requests per second each client may make to the PTO API, with bursts of
+# up to PTO_RATE_BURST. None turns rate limiting off. With the 'local'
+# backend each process keeps its own buckets; 'cache' counts in the Django
+# cache so the limit holds across workers.
+PTO_RATE_LIMIT = 20
+PTO_RATE_BURST = 100
+PTO_RATE_LIMIT_BACKEND = 'local'
+# The function that tells clients apart. The default uses REMOTE_ADDR,
+# which behind a proxy is the proxy's for every client; use
+# 'pto.decorators.forwarded_for' there instead.
+PTO_RATE_LIMIT_KEY = 'pto.decorators.remote_addr'
+
+# Identical calculate_pto requests that miss the result cache at the same
+# time share one computation. With the 'local' backend only the threads of
+# a process share it; 'cache' also coalesces across workers through a lock
+# in the Django cache, waiting at most PTO_COALESCE_TIMEOUT seconds for
+# another worker's result.
+PTO_COALESCE_BACKEND = 'local'
+PTO_COALESCE_TIMEOUT = 5
+
 ## Tests
-TEST_RUNNER = 'test_utils.runner.RadicalTestSuiteRunner'
+TEST_RUNNER = 'commons.runner.TestSuiteRunner'
+# Settings the test runner swaps in for the test run. Tasks run in-process,
+# without a broker. Rate limiting is off, since every test client shares
+# 127.0.0.1; the tests of it turn it on.
+TEST_SETTINGS = {
+    'BROKER_BACKEND': 'memory',
+    'CELERY_ALWAYS_EAGER': True,
+    'CELERY_EAGER_PROPAGATES_EXCEPTIONS': True,
+    'PTO_RATE_LIMIT': None,
+}
 
 ## Celery
 BROKER_HOST = 'localhost'